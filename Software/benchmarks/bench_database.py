@@ -0,0 +1,269 @@
+# Benchmarks of the database layer (and the PDF generators) on a synthetic store.
+#
+#   python benchmarks/bench_database.py [--products 10000] [--sales 100000] [--seed 42]
+#                                       [--ops 1000] [--data DIR] [--out results.json]
+#                                       [--compare baseline.json] [--threshold 0.2]
+#
+# The store is built by benchmarks/datagen.py; with --data it is kept in DIR
+# and reused by later runs with the same sizes and seed. Every run works on a
+# fresh copy, so runs are comparable. Results are latency percentiles per
+# operation, written as JSON with --out; --compare prints the change against
+# an earlier results file and exits with status 1 if an operation's median got
+# slower than --threshold. Runs headless: no Qt, no phone.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.datagen import generate_store  # noqa: E402
+from services import database  # noqa: E402
+from services.catalog_cache import catalog_cache  # noqa: E402
+
+CART_LINES = 8
+MAX_HISTORY_ROWS = 5_000_000
+
+
+def stats(timings, **extra):
+    timings = sorted(timings)
+    n = len(timings)
+
+    def percentile(p):
+        return timings[min(n - 1, int(p * n))] * 1000
+
+    return {
+        "ops": n,
+        "total_s": sum(timings),
+        "mean_ms": sum(timings) / n * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": timings[-1] * 1000,
+        **extra,
+    }
+
+
+def timed(fn, args_list, before=None):
+    # Times fn(*args) for each args; before(i) runs untimed ahead of each call
+    timings = []
+    for i, args in enumerate(args_list):
+        if before is not None:
+            before(i)
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def fill_cart(barcodes):
+    database.clear_cart()
+    database.add_many_to_cart(barcodes)
+    return database.get_cart_items()
+
+
+def bench_lookups(rng, barcodes, ops):
+    sample = rng.sample(barcodes, min(ops, len(barcodes)))
+    catalog_cache.clear()
+    yield "get_product_by_barcode (cold)", stats(timed(database.get_product_by_barcode, [(b,) for b in sample]))
+    yield "get_product_by_barcode (cached)", stats(timed(database.get_product_by_barcode, [(b,) for b in sample]))
+    unknown = [(f"999{i:010d}",) for i in range(ops)]
+    yield "get_product_by_barcode (unknown)", stats(timed(database.get_product_by_barcode, unknown))
+
+
+def bench_cart(rng, barcodes, ops):
+    # Scans of a few distinct products: mostly increments, some new lines
+    basket = rng.sample(barcodes, 20)
+    scans = [(rng.choice(basket),) for _ in range(ops)]
+    timings = timed(
+        database.add_to_cart_or_increment, scans,
+        before=lambda i: database.clear_cart() if i % 50 == 0 else None
+    )
+    database.clear_cart()
+    yield "add_to_cart_or_increment", stats(timings)
+
+
+def bench_sales(rng, barcodes, ops):
+    carts = [rng.sample(barcodes, CART_LINES) for _ in range(max(1, ops // 10))]
+    items = [fill_cart(cart) for cart in carts]
+    database.clear_cart()
+    yield "decrement_stock_after_sale", stats(timed(database.decrement_stock_after_sale, [(i,) for i in items]))
+
+    timings = []
+    for cart in carts:
+        cart_items = fill_cart(cart)
+        started = time.perf_counter()
+        database.checkout(cart_items, None)
+        timings.append(time.perf_counter() - started)
+    yield "checkout", stats(timings, lines=CART_LINES)
+
+    max_id = database.get_connection().execute("SELECT MAX(id) FROM sales").fetchone()[0]
+    sale_ids = rng.sample(range(1, max_id + 1), min(max(1, ops // 10), max_id))
+    yield "cancel_sale", stats(timed(database.cancel_sale, [(i,) for i in sale_ids]))
+
+
+def bench_history(rng, sales):
+    # get_sales_history loads every row in memory: run it a few times only,
+    # and not at all on stores too large for that
+    if sales > MAX_HISTORY_ROWS:
+        yield "get_sales_history", {"skipped": f"more than {MAX_HISTORY_ROWS} rows"}
+    else:
+        repeats = 3 if sales <= 1_000_000 else 1
+        yield "get_sales_history", stats(timed(database.get_sales_history, [()] * repeats), rows=sales)
+
+    def first_pages(pages=10):
+        after = None
+        for _ in range(pages):
+            rows = database.get_sales_page(after, 500)
+            after = (rows[-1][5], rows[-1][0])
+
+    yield "get_sales_page (10 x 500 rows)", stats(timed(first_pages, [()] * 20))
+
+
+def bench_pdf(rng, barcodes, ops, out_dir):
+    try:
+        from services.pdf_generator import generate_facture_pdf
+    except ImportError as e:
+        yield "generate_facture_pdf", {"skipped": str(e)}
+    else:
+        baskets = [
+            [(f"Product {i}", rng.choice(barcodes), round(rng.uniform(0.5, 100), 2), rng.randint(1, 4))
+             for i in range(CART_LINES)]
+            for _ in range(max(1, ops // 10))
+        ]
+        jobs = [(i, basket, out_dir) for i, basket in enumerate(baskets)]
+        yield "generate_facture_pdf", stats(timed(generate_facture_pdf, jobs), lines=CART_LINES)
+
+    try:
+        from services.table_to_pdf import generate_table_pdf
+    except ImportError as e:
+        yield "generate_table_pdf", {"skipped": str(e)}
+    else:
+        rows = 10_000
+
+        def export():
+            sales = itertools.islice(database.iter_sales(), rows)
+            generate_table_pdf("Sales History", ["Barcode", "Name", "Price", "Qty", "Date"], sales,
+                               os.path.join(out_dir, "sales.pdf"))
+
+        yield "generate_table_pdf", stats(timed(export, [()] * 3), rows=rows)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    # Prints the median change per operation; returns the regressed names
+    regressions = []
+    print(f"\n{'operation':36} {'baseline p50':>13} {'p50':>10} {'change':>8}")
+    for name, current in results.items():
+        before = baseline["results"].get(name)
+        if not before or "p50_ms" not in before or "p50_ms" not in current:
+            continue
+        change = current["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:36} {before['p50_ms']:10.3f} ms {current['p50_ms']:7.3f} ms {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the database layer on a synthetic store.")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--sales", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ops", type=int, default=1000, help="operations per fast benchmark")
+    parser.add_argument("--data", help="directory to keep generated stores in (default: regenerate each run)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="median slowdown counted as a regression")
+    parser.add_argument("--skip-pdf", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(args.data or tmp, f"store_{args.products}_{args.sales}_{args.seed}.sqlite")
+        if not os.path.exists(store):
+            os.makedirs(os.path.dirname(store), exist_ok=True)
+            print(f"Generating {store}")
+            generate_store(store, args.products, args.sales, args.seed)
+
+        work = os.path.join(tmp, "bench.sqlite")
+        shutil.copyfile(store, work)
+        database.close_connection()
+        database.DB_FILE = work
+        database.init_db()
+        barcodes = [row[0] for row in database.get_connection().execute("SELECT barcode FROM products")]
+
+        rng = random.Random(args.seed)
+        benchmarks = [
+            bench_lookups(rng, barcodes, args.ops),
+            bench_cart(rng, barcodes, args.ops),
+            bench_history(rng, args.sales),
+            bench_sales(rng, barcodes, args.ops),
+        ]
+        if not args.skip_pdf:
+            benchmarks.append(bench_pdf(rng, barcodes, args.ops, tmp))
+
+        results = {}
+        print(f"{'operation':36} {'ops':>6} {'p50':>10} {'p95':>10} {'p99':>10}")
+        for benchmark in benchmarks:
+            for name, result in benchmark:
+                results[name] = result
+                if "skipped" in result:
+                    print(f"{name:36} skipped ({result['skipped']})")
+                else:
+                    print(f"{name:36} {result['ops']:6} {result['p50_ms']:7.3f} ms "
+                          f"{result['p95_ms']:7.3f} ms {result['p99_ms']:7.3f} ms")
+        database.close_connection()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "products": args.products,
+            "sales": args.sales,
+            "seed": args.seed,
+            "ops": args.ops,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        same_store = all(baseline["meta"].get(key) == args.__dict__[key] for key in ("products", "sales", "seed"))
+        if not same_store:
+            print("\nwarning: the baseline was run on a different store size or seed")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
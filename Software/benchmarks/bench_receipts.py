@@ -0,0 +1,58 @@
+# Receipt rendering throughput.
+#
+#   python benchmarks/bench_receipts.py [--receipts 200] [--out DIR]
+#
+# Renders batches of typical (8 line) and large (500 line) baskets and reports
+# receipts/s and bytes written per receipt.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.pdf_generator import generate_facture_pdfs  # noqa: E402
+
+BASKETS = {"typical": 8, "large": 500}
+
+
+def make_basket(rng, lines):
+    return [
+        (f"Product {rng.randrange(10000)}", f"{rng.randrange(10**12, 10**13)}",
+         round(rng.uniform(0.5, 100), 2), rng.randint(1, 5))
+        for _ in range(lines)
+    ]
+
+
+def run(name, lines, receipts, out_dir, rng):
+    jobs = [(f"{name}_{i:05d}", make_basket(rng, lines)) for i in range(receipts)]
+    started = time.perf_counter()
+    files = generate_facture_pdfs(jobs, out_dir)
+    elapsed = time.perf_counter() - started
+    size = sum(os.path.getsize(f) for f in files)
+    print(f"{name:8} {lines:4} lines  {receipts / elapsed:8.1f} receipts/s  "
+          f"{elapsed / receipts * 1000:7.2f} ms/receipt  {size / receipts / 1024:7.1f} KiB/receipt")
+    return {"basket": name, "lines": lines, "receipts": receipts, "seconds": elapsed, "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark facture PDF rendering.")
+    parser.add_argument("--receipts", type=int, default=200, help="receipts per basket size")
+    parser.add_argument("--out", help="directory for the PDFs (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = args.out or tmp
+        for name, lines in BASKETS.items():
+            # Large baskets are slow by nature; keep the run short
+            receipts = args.receipts if lines < 100 else max(1, args.receipts // 20)
+            run(name, lines, receipts, out_dir, rng)
+
+
+if __name__ == "__main__":
+    main()
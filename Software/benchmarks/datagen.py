@@ -0,0 +1,134 @@
+# Seeded synthetic store data for the benchmarks.
+#
+#   python benchmarks/datagen.py DB_PATH [--products 10000] [--sales 100000] [--seed 42]
+#
+# Creates a database with the app's schema (services/migrations.py), a catalog
+# of --products products and a sales history of --sales lines grouped into
+# factures of 1-12 lines over one year, with the summary tables filled in.
+# The same arguments always produce the same data.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services import database  # noqa: E402
+
+START = datetime(2025, 1, 1, 8)
+DAYS = 365
+CHUNK = 100_000
+STOCK = 10**6  # large enough that the benchmarks never run out
+WORDS = [
+    "milk", "bread", "water", "juice", "coffee", "tea", "sugar", "salt", "oil", "rice", "pasta", "cheese",
+    "butter", "yogurt", "soap", "shampoo", "chocolate", "biscuit", "flour", "eggs", "tuna", "harissa",
+]
+
+
+def make_catalog(rng, products):
+    # -> [(name, barcode, price, quantity)]
+    codes = rng.sample(range(10**10), products)
+    return [
+        (f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i % 1000}", f"619{code:010d}",
+         round(rng.uniform(0.2, 150), 2), STOCK)
+        for i, code in enumerate(codes)
+    ]
+
+
+def _sales(rng, catalog, sales):
+    # Factures in chronological order: yields (facture, lines) with
+    # facture = (id, total, date) and lines = [(barcode, name, price, quantity, date, facture_id)]
+    factures = max(1, sales // 6)
+    gap = DAYS * 86400 / factures
+    when = START
+    written = 0
+    facture_id = 0
+    while written < sales:
+        facture_id += 1
+        when += timedelta(seconds=rng.expovariate(1 / gap))
+        date = when.isoformat(timespec="microseconds")
+        lines = []
+        for _ in range(min(rng.randint(1, 12), sales - written)):
+            # Skewed towards the start of the catalog: a few best sellers, a long tail
+            name, barcode, price, _ = catalog[int(len(catalog) * rng.random() ** 3)]
+            lines.append((barcode, name, price, rng.randint(1, 4), date, facture_id))
+        written += len(lines)
+        total = sum(price * quantity for _, _, price, quantity, _, _ in lines)
+        yield (facture_id, total, date), lines
+
+
+def generate_store(path, products=10_000, sales=100_000, seed=42, log=print):
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    database.close_connection()
+    database.DB_FILE = path
+    database.init_db()
+    conn = database.get_connection()
+
+    started = time.perf_counter()
+    catalog = make_catalog(rng, products)
+    database.import_products(catalog[i:i + CHUNK] for i in range(0, len(catalog), CHUNK))
+    log(f"{products} products in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    facture_rows, sale_rows = [], []
+
+    def flush():
+        with conn:
+            conn.executemany("INSERT INTO factures (id, total, date, filepath) VALUES (?, ?, ?, NULL)", facture_rows)
+            conn.executemany(
+                "INSERT INTO sales (barcode, name, price, quantity, date, facture_id) VALUES (?, ?, ?, ?, ?, ?)",
+                sale_rows
+            )
+        facture_rows.clear()
+        sale_rows.clear()
+
+    for facture, lines in _sales(rng, catalog, sales):
+        facture_rows.append(facture)
+        sale_rows.extend(lines)
+        if len(sale_rows) >= CHUNK:
+            flush()
+    flush()
+    log(f"{sales} sales lines in {time.perf_counter() - started:.1f}s")
+
+    # Summary tables, as checkout() would have maintained them
+    started = time.perf_counter()
+    with conn:
+        conn.execute('''
+            INSERT INTO sales_daily (day, barcode, name, quantity, revenue)
+            SELECT substr(date, 1, 10), barcode, MAX(name), SUM(quantity), SUM(price * quantity)
+            FROM sales GROUP BY substr(date, 1, 10), barcode
+        ''')
+        conn.execute('''
+            INSERT INTO sales_hourly (hour, quantity, revenue)
+            SELECT substr(date, 1, 13), SUM(quantity), SUM(price * quantity)
+            FROM sales GROUP BY substr(date, 1, 13)
+        ''')
+        conn.execute('''
+            INSERT INTO facture_totals (facture_id, lines, quantity, revenue)
+            SELECT facture_id, COUNT(*), SUM(quantity), SUM(price * quantity)
+            FROM sales WHERE facture_id IS NOT NULL GROUP BY facture_id
+        ''')
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    database.close_connection()
+    log(f"summaries in {time.perf_counter() - started:.1f}s")
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic store database.")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--sales", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate_store(args.path, args.products, args.sales, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# Several tills scanning and checking out against one database at once.
+#
+#   python benchmarks/stress_terminals.py [--tills 4] [--duration 10] [--products 1000]
+#                                         [--scarce 10] [--scarce-stock 200] [--seed 42]
+#
+# Each till is its own process with its own terminal id, connection and cart.
+# Tills scan bursts of products and check out (or abandon) their cart. Every
+# burst may include one of the --scarce products, which only have
+# --scarce-stock units each, so the tills compete for the same stock rows until
+# they sell out. At the end the database must account for every unit:
+# stock + units sold == initial stock for each product, no stock below zero,
+# the sales recorded match what the tills saw accepted, and no cart is left
+# behind. Prints throughput per till and per second of the run, plus scan and
+# checkout latencies; exits with status 1 if a check fails.
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.bench_database import stats  # noqa: E402
+from benchmarks.datagen import generate_store  # noqa: E402
+from services import database  # noqa: E402
+
+ABANDONED = 0.1  # share of carts cleared instead of checked out
+
+
+def till(index, path, barcodes, scarce, start_at, deadline, seed):
+    database.DB_FILE = path
+    database.set_terminal_id(f"till-{index}")
+    rng = random.Random(seed * 1000 + index)
+    sold = Counter()
+    checkouts = []  # completion times
+    scan_timings, checkout_timings = [], []
+    scans = rejected = errors = 0
+
+    database.clear_cart()
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < deadline:
+        burst = [rng.choice(barcodes) for _ in range(rng.randint(1, 8))]
+        if rng.random() < 0.5:
+            burst += [rng.choice(scarce)] * rng.randint(1, 3)
+        scans += len(burst)
+        try:
+            started = time.perf_counter()
+            results = database.add_many_to_cart(burst)
+            scan_timings.append(time.perf_counter() - started)
+            rejected += sum(result["rejected"] for result in results.values())
+
+            items = database.get_cart_items()
+            if rng.random() < ABANDONED:
+                database.clear_cart()
+                continue
+            started = time.perf_counter()
+            database.checkout(items, None)
+            checkout_timings.append(time.perf_counter() - started)
+        except (sqlite3.OperationalError, ValueError):
+            errors += 1
+            database.clear_cart()
+            continue
+        checkouts.append(time.time())
+        for _, name, barcode, price, quantity in items:
+            sold[barcode] += quantity
+    database.close_connection()
+    return {
+        "terminal": f"till-{index}", "sold": sold, "checkouts": checkouts, "scans": scans,
+        "rejected": rejected, "errors": errors, "scan_timings": scan_timings, "checkout_timings": checkout_timings,
+    }
+
+
+def check(path, initial, reports):
+    # -> list of failed checks
+    conn = sqlite3.connect(path)
+    failures = []
+    stock = dict(conn.execute("SELECT barcode, quantity FROM products"))
+    recorded = dict(conn.execute("SELECT barcode, SUM(quantity) FROM sales GROUP BY barcode"))
+    reported = Counter()
+    for report in reports:
+        reported.update(report["sold"])
+
+    for barcode, quantity in initial.items():
+        sold = recorded.get(barcode, 0)
+        if stock[barcode] < 0:
+            failures.append(f"{barcode}: stock went negative ({stock[barcode]})")
+        if stock[barcode] + sold != quantity:
+            failures.append(f"{barcode}: {stock[barcode]} left + {sold} sold != {quantity} initial")
+        if sold != reported.get(barcode, 0):
+            failures.append(f"{barcode}: {sold} sales recorded, tills sold {reported.get(barcode, 0)}")
+
+    factures = conn.execute("SELECT COUNT(*) FROM factures").fetchone()[0]
+    checkouts = sum(len(report["checkouts"]) for report in reports)
+    if factures != checkouts:
+        failures.append(f"{factures} factures recorded for {checkouts} checkouts")
+    carts = conn.execute("SELECT COUNT(*) FROM cart").fetchone()[0]
+    if carts:
+        failures.append(f"{carts} cart lines left behind")
+    conn.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test several tills sharing one database.")
+    parser.add_argument("--tills", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of scanning")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--scarce", type=int, default=10, help="products the tills compete for")
+    parser.add_argument("--scarce-stock", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tills.sqlite")
+        generate_store(path, args.products, 0, args.seed, log=lambda message: None)
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("UPDATE products SET quantity = ? WHERE id <= ?", (args.scarce_stock, args.scarce))
+        initial = dict(conn.execute("SELECT barcode, quantity FROM products"))
+        scarce = [row[0] for row in conn.execute("SELECT barcode FROM products WHERE id <= ?", (args.scarce,))]
+        barcodes = [row[0] for row in conn.execute("SELECT barcode FROM products WHERE id > ?", (args.scarce,))]
+        conn.close()
+
+        # Tills start together once every process is up
+        start_at = time.time() + 2.0
+        deadline = start_at + args.duration
+        jobs = [(i, path, barcodes, scarce, start_at, deadline, args.seed) for i in range(args.tills)]
+        with multiprocessing.get_context("spawn").Pool(args.tills) as pool:
+            reports = pool.starmap(till, jobs)
+
+        print(f"{'terminal':10} {'checkouts/s':>12} {'scans':>8} {'rejected':>9} {'errors':>7}")
+        for report in reports:
+            print(f"{report['terminal']:10} {len(report['checkouts']) / args.duration:12.1f} "
+                  f"{report['scans']:8} {report['rejected']:9} {report['errors']:7}")
+
+        per_second = Counter(int(t - start_at) for report in reports for t in report["checkouts"])
+        seconds = [per_second.get(second, 0) for second in range(int(args.duration))]
+        print(f"\ncheckouts per second, all tills: {seconds}")
+        if seconds:
+            print(f"min {min(seconds)}  median {sorted(seconds)[len(seconds) // 2]}  max {max(seconds)}")
+
+        for name, key in (("add_many_to_cart", "scan_timings"), ("checkout", "checkout_timings")):
+            timings = [t for report in reports for t in report[key]]
+            if timings:
+                result = stats(timings)
+                print(f"{name:18} p50 {result['p50_ms']:7.3f} ms  p95 {result['p95_ms']:7.3f} ms  "
+                      f"p99 {result['p99_ms']:7.3f} ms  max {result['max_ms']:7.3f} ms")
+
+        sold_out = sum(1 for barcode in scarce if initial[barcode] == sum(r["sold"][barcode] for r in reports))
+        print(f"\n{sold_out} of {len(scarce)} scarce products sold out")
+        failures = check(path, initial, reports)
+        database.close_connection()
+
+    if failures:
+        print(f"\nFAILED: {len(failures)} check(s)")
+        for failure in failures[:20]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("OK: every unit accounted for, no oversell, no cart left behind")
+
+
+if __name__ == "__main__":
+    main()
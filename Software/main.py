@@ -1,12 +1,57 @@
+import argparse
 import sys
-from PyQt6.QtWidgets import QApplication
+from services.startup_profiler import profiler
+from services.metrics import metrics
+
+if "--profile-startup" in sys.argv:
+    profiler.start()  # before the heavy imports below so they are timed too
+if "--metrics" in sys.argv:
+    metrics.enable()  # before the services are imported, see services/metrics.py
+
+from PyQt6.QtWidgets import QApplication, QMessageBox
+from PyQt6.QtCore import QTimer
 from ui.main_window import MainWindow
-from services.database import init_db
+from services.database import init_db, close_connection, set_terminal_id, set_journal_mode, JOURNAL_MODES
+from services.scanner import get_scanner, load_routes
+from services.facture_renderer import get_facture_renderer
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scan-server", nargs="?", const="", metavar="HOST:PORT",
+        help="also accept scans over TCP/UDP; only from this PC unless HOST is given (unauthenticated: trusted LANs only)"
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="time imports and startup phases, written to startup_profile.txt"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true",
+        help="time database, adb and PDF calls (Tools > Diagnostics, metrics.log)"
+    )
+    parser.add_argument(
+        "--terminal", metavar="NAME",
+        help="id of this till's cart when several tills on this PC share db.sqlite (default: unique per run)"
+    )
+    parser.add_argument(
+        "--journal-mode", type=str.upper, choices=JOURNAL_MODES,
+        help="SQLite journal mode of db.sqlite (default: WAL on a local disk, DELETE on a network share)"
+    )
+    # Leave Qt's own options in argv for QApplication
+    return parser.parse_known_args()
 
 def main():
+    args, qt_args = parse_args()
+    profiler.mark("imports")
+    if args.terminal:
+        set_terminal_id(args.terminal)
+    if args.journal_mode:
+        set_journal_mode(args.journal_mode)
     init_db()  # ✅ Create tables before launching app
+    profiler.mark("init_db")
 
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    profiler.mark("QApplication")
 
     # ✅ Load and apply stylesheet
     try:
@@ -14,10 +59,47 @@ def main():
             app.setStyleSheet(f.read())
     except FileNotFoundError:
         return
+    profiler.mark("stylesheet")
 
+    # Which tab or cart each scanning phone feeds (scanners.json, optional)
+    try:
+        get_scanner().routes = load_routes()
+    except ValueError as e:
+        QMessageBox.warning(None, "Scanner Routes", f"Ignoring the scanner routes:\n{e}")
+
+    scan_server = None
+    if args.scan_server is not None:
+        from services.scan_server import ScanServer, DEFAULT_HOST, DEFAULT_PORT
+        host, _, port = args.scan_server.rpartition(":")
+        if not host and port and not port.isdigit():
+            host, port = port, ""  # only a host given
+        try:
+            scan_server = ScanServer(get_scanner().publish, host or DEFAULT_HOST, int(port or DEFAULT_PORT))
+            scan_server.start()
+        except (ValueError, OSError) as e:
+            # A port that is not a number, or already in use
+            scan_server = None
+            QMessageBox.warning(
+                None, "Scan Server", f"Scans will not be received over the network:\n{args.scan_server}: {e}"
+            )
+        profiler.mark("scan server")
+
+    metrics.start_dumping()
     window = MainWindow()
+    profiler.mark("MainWindow")
     window.show()
-    sys.exit(app.exec())
+    profiler.mark("window shown")
+    if args.profile_startup:
+        # Runs once the event loop has painted the window
+        QTimer.singleShot(0, lambda: (profiler.mark("event loop running"), profiler.write_report()))
+
+    exit_code = app.exec()
+    if scan_server:
+        scan_server.stop()
+    get_facture_renderer().shutdown()
+    metrics.stop_dumping()
+    close_connection()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
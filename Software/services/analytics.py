@@ -0,0 +1,199 @@
+import threading
+from datetime import date, timedelta, datetime, timezone
+
+import numpy as np
+
+from services.database import get_connection
+
+CHUNK_SIZE = 200_000
+NO_FACTURE = -1
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _day_start(day):
+    # sales.date is local time; it is converted to seconds as if it were UTC
+    # (numpy datetime64), so day bounds are computed the same way
+    return int(datetime.combine(date.fromisoformat(day), datetime.min.time(), timezone.utc).timestamp())
+
+
+# The sales table held in memory as NumPy columns, one array per field.
+# Barcodes are dictionary-encoded into small integer codes so every query is
+# a vectorized group-by (bincount/unique) instead of a Python loop.
+# refresh() only reads the rows added since the last load (by id); if rows
+# that were already loaded have been canceled or unlinked from their facture
+# (checked against the summary tables) it reloads everything.
+class SalesAnalytics:
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.ids = np.empty(0, np.int64)
+        self.codes = np.empty(0, np.int32)      # index into self.barcodes
+        self.quantity = np.empty(0, np.int64)
+        self.revenue = np.empty(0, np.float64)
+        self.timestamp = np.empty(0, np.int64)  # seconds, see _day_start
+        self.facture_id = np.empty(0, np.int64)  # NO_FACTURE when not linked
+        self.barcodes = []
+        self.names = []
+        self._code_of = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _stored_totals(self, conn):
+        # Items sold and facture-linked lines according to the summary tables
+        # kept by database.py; they drop when loaded rows are canceled or
+        # unlinked from their facture
+        quantity = conn.execute("SELECT TOTAL(quantity) FROM sales_daily").fetchone()[0]
+        lines = conn.execute("SELECT TOTAL(lines) FROM facture_totals").fetchone()[0]
+        return int(quantity), int(lines)
+
+    def _loaded_totals(self):
+        return int(self.quantity.sum()), int(np.count_nonzero(self.facture_id != NO_FACTURE))
+
+    def refresh(self):
+        with self._lock:
+            conn = get_connection()
+            conn.execute("BEGIN")  # one snapshot for the check and the load
+            try:
+                self._load_after(conn, int(self.ids[-1]) if len(self.ids) else 0)
+                if self._loaded_totals() != self._stored_totals(conn):
+                    self._clear()
+                    self._load_after(conn, 0)
+            finally:
+                conn.execute("COMMIT")
+        return self
+
+    def reload(self):
+        with self._lock:
+            self._clear()
+            self._load_after(get_connection(), 0)
+        return self
+
+    def _encode(self, barcodes, conn):
+        code_of = self._code_of
+        for barcode in set(barcodes).difference(code_of):
+            code_of[barcode] = len(self.barcodes)
+            self.barcodes.append(barcode)
+            row = conn.execute(
+                "SELECT name FROM sales WHERE barcode = ? ORDER BY date DESC LIMIT 1", (barcode,)
+            ).fetchone()
+            self.names.append(row[0] if row else "")
+        return np.fromiter(map(code_of.__getitem__, barcodes), np.int32, len(barcodes))
+
+    def _load_after(self, conn, last_id):
+        # Rows are read by id range, each column packed by SQLite into one
+        # string per chunk and parsed by NumPy, which avoids building a Python
+        # tuple per sale line
+        max_id = conn.execute("SELECT MAX(id) FROM sales").fetchone()[0] or 0
+        chunks = []
+        for low in range(last_id, max_id, self.chunk_size):
+            row = conn.execute(
+                """
+                SELECT group_concat(id), group_concat(COALESCE(quantity, 0)),
+                       group_concat(COALESCE(price * quantity, 0)),
+                       group_concat(COALESCE(barcode, ''), char(10)),
+                       group_concat(COALESCE(substr(date, 1, 19), '1970-01-01'), char(10)),
+                       group_concat(COALESCE(facture_id, ?))
+                FROM sales WHERE id > ? AND id <= ?
+                """,
+                (NO_FACTURE, low, low + self.chunk_size)
+            ).fetchone()
+            if row[0] is None:
+                continue
+            ids, quantity, revenue, barcodes, dates, facture_id = row
+            chunks.append((
+                np.fromstring(ids, np.int64, sep=","),
+                self._encode(barcodes.split("\n"), conn),
+                np.fromstring(quantity, np.int64, sep=","),
+                np.fromstring(revenue, np.float64, sep=","),
+                np.array(dates.split("\n"), dtype="datetime64[s]").astype(np.int64),
+                np.fromstring(facture_id, np.int64, sep=","),
+            ))
+        if chunks:
+            columns = ("ids", "codes", "quantity", "revenue", "timestamp", "facture_id")
+            for i, name in enumerate(columns):
+                setattr(self, name, np.concatenate([getattr(self, name)] + [chunk[i] for chunk in chunks]))
+
+    def _mask(self, date_from=None, date_to=None):
+        # Inclusive ISO days, like the History filters
+        if not date_from and not date_to:
+            return None
+        mask = np.ones(len(self.ids), bool)
+        if date_from:
+            mask &= self.timestamp >= _day_start(date_from)
+        if date_to:
+            mask &= self.timestamp < _day_start((date.fromisoformat(date_to) + timedelta(days=1)).isoformat())
+        return mask
+
+    def _select(self, mask, *columns):
+        if mask is None:
+            return columns
+        return tuple(column[mask] for column in columns)
+
+    def top_products(self, n=10, by="revenue", date_from=None, date_to=None):
+        # [(barcode, name, quantity, revenue)], best first
+        codes, quantity, revenue = self._select(self._mask(date_from, date_to), self.codes, self.quantity, self.revenue)
+        size = len(self.barcodes)
+        totals = {
+            "quantity": np.bincount(codes, weights=quantity, minlength=size),
+            "revenue": np.bincount(codes, weights=revenue, minlength=size),
+        }
+        key = totals[by]
+        n = min(n, np.count_nonzero(key))
+        top = np.argpartition(-key, n - 1)[:n] if n else np.empty(0, np.int64)
+        top = top[np.argsort(-key[top], kind="stable")]
+        return [
+            (self.barcodes[code], self.names[code], int(totals["quantity"][code]), float(totals["revenue"][code]))
+            for code in top
+        ]
+
+    def basket_sizes(self, date_from=None, date_to=None):
+        # Distribution of items per facture: (sizes, number of factures)
+        facture_id, quantity = self._select(self._mask(date_from, date_to), self.facture_id, self.quantity)
+        linked = facture_id != NO_FACTURE
+        _, inverse = np.unique(facture_id[linked], return_inverse=True)
+        items = np.bincount(inverse, weights=quantity[linked]).astype(np.int64)
+        return np.unique(items, return_counts=True)
+
+    def hourly_heatmap(self, value="revenue", date_from=None, date_to=None):
+        # 7 x 24 array (Monday first) of revenue or quantity per weekday and hour
+        timestamp, weights = self._select(self._mask(date_from, date_to), self.timestamp, getattr(self, value))
+        days = timestamp // 86400
+        weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+        hour = (timestamp // 3600) % 24
+        heatmap = np.bincount(weekday * 24 + hour, weights=weights, minlength=7 * 24)
+        return heatmap.reshape(7, 24)
+
+    def sell_through(self, date_from=None, date_to=None):
+        # [(barcode, name, sold, in stock, sold / (sold + in stock))] for the
+        # current catalog, fastest selling first
+        codes, quantity = self._select(self._mask(date_from, date_to), self.codes, self.quantity)
+        sold = np.bincount(codes, weights=quantity, minlength=len(self.barcodes))
+        products = get_connection().execute("SELECT barcode, name, quantity FROM products").fetchall()
+        if not products:
+            return []
+        barcodes, names, stock = zip(*products)
+        stock = np.fromiter(stock, np.float64, len(products))
+        product_codes = np.fromiter((self._code_of.get(b, -1) for b in barcodes), np.int64, len(products))
+        product_sold = np.append(sold, 0.0)[product_codes]  # code -1: never sold
+        total = product_sold + stock
+        rate = np.divide(product_sold, total, out=np.zeros_like(total), where=total > 0)
+        order = np.argsort(-rate, kind="stable")
+        return [
+            (barcodes[i], names[i], int(product_sold[i]), int(stock[i]), float(rate[i]))
+            for i in order
+        ]
+
+
+_analytics = None
+
+
+def get_sales_analytics():
+    # Shared, incrementally refreshed instance
+    global _analytics
+    if _analytics is None:
+        _analytics = SalesAnalytics()
+    return _analytics.refresh()
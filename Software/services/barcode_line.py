@@ -0,0 +1,19 @@
+from datetime import datetime
+
+SCAN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_barcode(line):
+    # Lines written by the phone look like "<barcode> | <timestamp>"
+    return line.split('|')[0].strip()
+
+
+def parse_scan_time(line):
+    # When the phone scanned the line (its own clock), or None
+    _, sep, stamp = line.partition('|')
+    if not sep:
+        return None
+    try:
+        return datetime.strptime(stamp.strip(), SCAN_TIME_FORMAT)
+    except ValueError:
+        return None
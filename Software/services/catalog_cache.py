@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+MAX_PRODUCTS = 20000    # cached barcode -> product rows before LRU eviction
+NEGATIVE_TTL = 5.0      # seconds an unknown barcode is remembered as missing
+
+_MISSING = object()
+
+
+# Barcode -> product row cache in front of the products table. Unknown barcodes
+# are cached as None for NEGATIVE_TTL seconds so repeated scans of an unknown
+# code don't hit the database either. Every write to products must invalidate
+# the barcodes it touched; writes from other tills are caught by
+# database._sync_catalog_cache, which clears the whole cache.
+class CatalogCache:
+    def __init__(self, max_size=MAX_PRODUCTS, negative_ttl=NEGATIVE_TTL):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._products = OrderedDict()
+        self._missing = {}  # barcode -> expiry time
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, barcode):
+        # Returns the cached product, None for a known-missing barcode, or
+        # _MISSING when the database has to be asked.
+        with self._lock:
+            product = self._products.get(barcode, _MISSING)
+            if product is not _MISSING:
+                self._products.move_to_end(barcode)
+                self.hits += 1
+                return product
+
+            expiry = self._missing.get(barcode)
+            if expiry is not None:
+                if expiry > time.monotonic():
+                    self.negative_hits += 1
+                    return None
+                del self._missing[barcode]
+
+            self.misses += 1
+            return _MISSING
+
+    def put(self, barcode, product):
+        with self._lock:
+            if product is None:
+                self._missing[barcode] = time.monotonic() + self.negative_ttl
+                return
+            self._missing.pop(barcode, None)
+            self._products[barcode] = product
+            self._products.move_to_end(barcode)
+            while len(self._products) > self.max_size:
+                self._products.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *barcodes):
+        with self._lock:
+            for barcode in barcodes:
+                self._products.pop(barcode, None)
+                self._missing.pop(barcode, None)
+
+    def clear(self):
+        with self._lock:
+            self._products.clear()
+            self._missing.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._products),
+                "negative_size": len(self._missing),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
+
+
+def is_missing(product):
+    return product is _MISSING
+
+
+catalog_cache = CatalogCache()
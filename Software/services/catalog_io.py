@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+
+from services.database import iter_products, import_products
+
+# Supplier catalogs: CSV with a header row, or JSON Lines with one object per
+# line, both using these fields. quantity is optional; without it the stock of
+# existing products is kept.
+FIELDS = ("barcode", "name", "price", "quantity")
+BATCH_SIZE = 50000  # rows per executemany
+
+
+def _is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in (".jsonl", ".json", ".ndjson")
+
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {"barcode", "name", "price"}.difference(reader.fieldnames)
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(sorted(missing))}")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _read_jsonl(file):
+    for line_num, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, e
+            continue
+        yield line_num, record
+
+
+def _parse(record):
+    # -> (name, barcode, price, quantity) or ValueError
+    if not isinstance(record, dict):
+        raise ValueError("not an object")
+    barcode = str(record.get("barcode") or "").strip()
+    name = str(record.get("name") or "").strip()
+    if not barcode:
+        raise ValueError("missing barcode")
+    if not name:
+        raise ValueError("missing name")
+    try:
+        price = float(record.get("price"))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {record.get('price')!r}")
+    if not price >= 0:
+        raise ValueError(f"invalid price {record.get('price')!r}")
+
+    quantity = record.get("quantity")
+    if quantity is None or str(quantity).strip() == "":
+        quantity = None
+    else:
+        try:
+            quantity = int(str(quantity).strip())
+        except ValueError:
+            raise ValueError(f"invalid quantity {record.get('quantity')!r}")
+        if quantity < 0:
+            raise ValueError(f"invalid quantity {quantity}")
+    return name, barcode, price, quantity
+
+
+class ImportCanceled(Exception):
+    pass
+
+
+def import_catalog(path, progress=None, batch_size=BATCH_SIZE):
+    # Stream a CSV/JSONL catalog into products in one transaction,
+    # batch_size rows per executemany. progress(rows_read) is called after
+    # each batch and may return False to cancel: nothing is imported then.
+    # Returns {"inserted", "updated", "unchanged", "rejected": [(line, reason)],
+    # "canceled"}: products added, changed, and rows matching the catalog already.
+    rejected = []
+
+    def batches(records):
+        batch, read = [], 0
+        for line_num, record in records:
+            read += 1
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f"invalid JSON: {record}")
+                batch.append(_parse(record))
+            except ValueError as e:
+                rejected.append((line_num, str(e)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+                if progress is not None and progress(read) is False:
+                    raise ImportCanceled()
+        if batch:
+            yield batch
+
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        records = _read_jsonl(file) if _is_jsonl(path) else _read_csv(file)
+        try:
+            counts = import_products(batches(records))
+        except ImportCanceled:
+            return {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": rejected, "canceled": True}
+    return {
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+        "unchanged": counts["read"] - counts["inserted"] - counts["updated"],
+        "rejected": rejected,
+        "canceled": False,
+    }
+
+
+def write_rejects(rejects, path):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["line", "reason"])
+        writer.writerows(rejects)
+
+
+def export_catalog(path, chunk_size=BATCH_SIZE):
+    # Stream the whole catalog to CSV or JSONL (by file extension) in the
+    # import format. Returns the number of products written.
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if _is_jsonl(path):
+            for _, name, barcode, price, quantity in iter_products(chunk_size):
+                file.write(json.dumps(
+                    {"barcode": barcode, "name": name, "price": price, "quantity": quantity}, ensure_ascii=False
+                ) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for _, name, barcode, price, quantity in iter_products(chunk_size):
+                writer.writerow((barcode, name, price, quantity))
+                count += 1
+    return count
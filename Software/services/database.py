@@ -1,226 +1,761 @@
+import os
+import random
+import socket
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from services.catalog_cache import catalog_cache, is_missing
+from services.metrics import metrics
+from services.migrations import migrate, PRODUCTS_FTS_TRIGGERS, VERSION_TRIGGERS
 
 DB_FILE = "db.sqlite"
 
+# Connection tuning
+BUSY_TIMEOUT = 5.0            # seconds to wait on a locked database
+CACHE_SIZE_KB = 16000         # page cache per connection
+MMAP_SIZE = 64 * 1024 * 1024  # memory-mapped I/O window
+STATEMENT_CACHE_SIZE = 256    # prepared statements kept per connection
+WRITE_RETRIES = 5             # further attempts when the write lock is still busy after BUSY_TIMEOUT
+RETRY_DELAY = 0.05            # seconds, doubled (with jitter) at each retry
+
+# Journal mode (main.py --journal-mode, or BARCODE_JOURNAL_MODE). WAL lets
+# the tills keep reading while one writes, but needs memory shared between
+# them and so only works on a local disk. By default a db.sqlite on a
+# network share (UNC path, network drive, NFS/SMB mount) uses DELETE,
+# SQLite's rollback journal, instead.
+JOURNAL_MODES = ("WAL", "DELETE", "TRUNCATE", "PERSIST")
+JOURNAL_MODE = os.environ.get("BARCODE_JOURNAL_MODE")  # None: WAL or DELETE by location
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smbfs", "smb3", "fuse.sshfs", "afs"}
+
+# Tills sharing one database each have their own cart, keyed by this id
+# (main.py --terminal, or BARCODE_TERMINAL; unique per running app by
+# default).
+TERMINAL_ID = os.environ.get("BARCODE_TERMINAL") or f"{socket.gethostname()}-{os.getpid()}"
+
+_local = threading.local()
+
+
+def is_network_path(path):
+    path = os.path.abspath(path)
+    if os.name == "nt":
+        if path.startswith("\\\\"):
+            return True  # UNC path
+        import ctypes
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == DRIVE_REMOTE
+    # Elsewhere: the filesystem of the deepest mount point holding the path
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    fstype, depth = None, -1
+    for mount, mount_fstype in mounts:
+        mount = mount.replace("\\040", " ")
+        if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > depth:
+            fstype, depth = mount_fstype, len(mount)
+    return fstype in NETWORK_FILESYSTEMS
+
+
+def journal_mode():
+    if not JOURNAL_MODE:
+        return "DELETE" if is_network_path(DB_FILE) else "WAL"
+    if JOURNAL_MODE.upper() not in JOURNAL_MODES:
+        raise ValueError(f"Unknown journal mode {JOURNAL_MODE!r}, expected one of {', '.join(JOURNAL_MODES)}")
+    return JOURNAL_MODE.upper()
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    mode = journal_mode()
+    wal = mode == "WAL"
+    conn.execute(f"PRAGMA journal_mode = {mode}")
+    # NORMAL is durable enough with WAL; a rollback journal needs FULL
+    conn.execute(f"PRAGMA synchronous = {'NORMAL' if wal else 'FULL'}")
+    conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    if wal:
+        # Memory-mapping a file on a network share is not safe
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    # One long-lived connection per thread. sqlite3 keeps the prepared
+    # statements of each connection cached, so the queries below are only
+    # compiled once.
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _open_connection()
+        _local.conn = conn
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.catalog_data_version = _local.catalog_version = None
+
+
+def set_terminal_id(terminal_id):
+    global TERMINAL_ID
+    TERMINAL_ID = terminal_id
+
+
+def set_journal_mode(mode):
+    # Applies to connections opened afterwards
+    global JOURNAL_MODE
+    JOURNAL_MODE = mode
+
+
+@contextmanager
+def _write_transaction(conn):
+    # BEGIN IMMEDIATE takes the write lock before anything is read, so stock
+    # checked inside the transaction cannot be changed by another till before
+    # it commits. The lock is awaited up to BUSY_TIMEOUT; if another till
+    # still holds it, try again a few times with backoff before giving up.
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            break
+        except sqlite3.OperationalError as e:
+            if attempt == WRITE_RETRIES or not ("locked" in str(e) or "busy" in str(e)):
+                raise
+            time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+    with conn:
+        yield conn.cursor()
+
+
+def get_data_version(*tables):
+    # Write counts of the tables (migrations.VERSIONED_TABLES), kept by
+    # triggers: changes whenever any till, worker thread or tool writes to one
+    # of them, and only then
+    conn = get_connection()
+    versions = dict(conn.execute(
+        f"SELECT name, version FROM table_versions WHERE name IN ({_placeholders(tables)})", tables
+    ))
+    return tuple(versions[table] for table in tables)
+
+
+def _placeholders(values):
+    return ", ".join("?" * len(values))
+
+
+def _fetch_page(table, columns, after, limit, order_by, descending, where=(), params=()):
+    # Keyset pagination: continue after the (order_by, id) key of the last row
+    # of the previous page instead of using OFFSET.
+    if order_by not in columns:
+        raise ValueError(f"Cannot sort {table} by {order_by!r}")
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+    clauses, args = list(where), list(params)
+    if after is not None:
+        if order_by == "id":
+            clauses.append(f"id {op} ?")
+            args.append(after[1])
+        elif after[0] is None:
+            # NULLs sort first ascending, last descending: the rest of the
+            # NULL run, then (ascending) every non-NULL key
+            clause = f"({order_by} IS NULL AND id {op} ?)"
+            if not descending:
+                clause += f" OR {order_by} IS NOT NULL"
+            clauses.append(f"({clause})")
+            args.append(after[1])
+        else:
+            clause = f"({order_by}, id) {op} (?, ?)"
+            if descending:
+                clause += f" OR {order_by} IS NULL"
+            clauses.append(f"({clause})")
+            args.extend(after)
+
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order_by} {direction}"
+    if order_by != "id":
+        sql += f", id {direction}"
+    sql += " LIMIT ?"
+    args.append(limit)
+    return get_connection().execute(sql, args).fetchall()
+
+
+def _iter_query(sql, params=(), chunk_size=1000):
+    # Stream a query's rows in chunks instead of materialising them all
+    cur = get_connection().execute(sql, params)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cur.close()
+
 
 def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            barcode TEXT UNIQUE,
-            price REAL,
-            quantity INTEGER
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            barcode TEXT,
-            name TEXT,
-            price REAL,
-            quantity INTEGER,
-            date TEXT
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS factures (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            total REAL,
-            date TEXT,
-            filepath TEXT
-        )
-    ''')
-    
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS cart (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            barcode TEXT UNIQUE,
-            price REAL,
-            quantity_to_buy INTEGER
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    # Create or upgrade the schema (see services/migrations.py)
+    migrate(get_connection())
+
+
+PRODUCT_COLUMNS = ("id", "name", "barcode", "price", "quantity")
+
 
 def add_product(name, barcode, price, quantity):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO products (name, barcode, price, quantity) VALUES (?, ?, ?, ?)",
-                (name, barcode, price, quantity))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("INSERT INTO products (name, barcode, price, quantity) VALUES (?, ?, ?, ?)",
+                     (name, barcode, price, quantity))
+    catalog_cache.invalidate(barcode)
+
+PRODUCT_VERSION_TRIGGERS = {name: sql for name, sql in VERSION_TRIGGERS.items() if name.startswith("products_")}
+BULK_IMPORT_ROWS = 20000  # from this batch size on, the search index is rebuilt once instead of per row
+
+def import_products(batches):
+    # Upsert batches of (name, barcode, price, quantity) rows on the barcode
+    # key, all in one transaction: an exception raised by the batches
+    # iterator rolls the whole import back. A quantity of None keeps the stock
+    # of an existing product (0 for a new one); unchanged rows are skipped.
+    # Returns {"read", "inserted", "updated"}: rows given, new products, and
+    # existing products that changed.
+    # For large imports the FTS sync triggers are dropped and the index is
+    # rebuilt at the end, which is several times faster than per-row updates;
+    # the products version is then bumped once instead of per row too.
+    conn = get_connection()
+    read = changed = 0
+    bulk = False
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        products_before = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        for batch in batches:
+            if not bulk and len(batch) >= BULK_IMPORT_ROWS and _products_fts_available(conn):
+                bulk = True
+                for name in (*PRODUCTS_FTS_TRIGGERS, *PRODUCT_VERSION_TRIGGERS):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cur = conn.executemany(
+                """
+                INSERT INTO products (name, barcode, price, quantity) VALUES (?, ?, ?, COALESCE(?, 0))
+                ON CONFLICT(barcode) DO UPDATE SET
+                    name = excluded.name,
+                    price = excluded.price,
+                    quantity = CASE WHEN ? IS NULL THEN products.quantity ELSE excluded.quantity END
+                WHERE products.name IS NOT excluded.name OR products.price IS NOT excluded.price
+                    OR (? IS NOT NULL AND products.quantity IS NOT excluded.quantity)
+                """,
+                [(name, barcode, price, quantity, quantity, quantity) for name, barcode, price, quantity in batch]
+            )
+            read += len(batch)
+            # Rows inserted or updated by the statement itself, not the
+            # triggers' (which conn.total_changes would count too)
+            changed += cur.rowcount
+        if bulk:
+            conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            for trigger in (*PRODUCTS_FTS_TRIGGERS.values(), *PRODUCT_VERSION_TRIGGERS.values()):
+                conn.execute(trigger)
+            conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'products'")
+        inserted = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] - products_before
+    catalog_cache.clear()
+    return {"read": read, "inserted": inserted, "updated": changed - inserted}
 
 def get_products():
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products")
-    products = cur.fetchall()
-    conn.close()
-    return products
+    return conn.execute("SELECT * FROM products").fetchall()
+
+def iter_products(chunk_size=1000):
+    return _iter_query("SELECT * FROM products ORDER BY id", (), chunk_size)
+
+def get_products_page(after=None, limit=500, order_by="id", descending=False, search=None):
+    if search:
+        return search_products_page(after, limit, order_by, descending, search)
+    return _fetch_page("products", PRODUCT_COLUMNS, after, limit, order_by, descending)
+
+SEARCH_COLUMNS = PRODUCT_COLUMNS + ("rank",)
+RANKED_SEARCH_LIMIT = 500  # matches ranked by relevance; broader searches are listed by id
+_has_products_fts = None
+
+def _products_fts_available(conn):
+    global _has_products_fts
+    if _has_products_fts is None:
+        _has_products_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+        ).fetchone() is not None
+    return _has_products_fts
+
+def _fts_prefix_query(text):
+    # Every word must match the start of a name or barcode token
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+def search_products_page(after=None, limit=500, order_by="rank", descending=False, search=""):
+    # Product rows plus their rank (best match first), paged like
+    # get_products_page. Uses the FTS5 index when SQLite has it.
+    conn = get_connection()
+    if not search.split():
+        return []
+    if _products_fts_available(conn):
+        query = _fts_prefix_query(search)
+        # bm25 has to score every match, so very broad prefixes ("m") are
+        # listed in catalog order instead: ranking them would cost tens of ms
+        # for little benefit. Selecting f.rowid as id lets FTS5 return them
+        # in id order and apply the page key itself.
+        matches = conn.execute(
+            "SELECT COUNT(*) FROM (SELECT rowid FROM products_fts WHERE products_fts MATCH ? LIMIT ?)",
+            (query, RANKED_SEARCH_LIMIT + 1)
+        ).fetchone()[0]
+        ranked = matches <= RANKED_SEARCH_LIMIT
+        table = f"""(
+            SELECT f.rowid AS id, p.name, p.barcode, p.price, p.quantity, {"f.rank" if ranked else "0"} AS rank
+            FROM products_fts f JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+        )"""
+        params = [query]
+        if not ranked and order_by == "rank":
+            order_by = "id"
+    else:
+        words = search.split()
+        matches = " AND ".join(["(name LIKE ? ESCAPE '\\' OR barcode LIKE ? ESCAPE '\\')"] * len(words))
+        table = f"(SELECT id, name, barcode, price, quantity, 0 AS rank FROM products WHERE {matches})"
+        params = []
+        for word in words:
+            word = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params += [f"%{word}%", f"{word}%"]
+        if order_by == "rank":
+            order_by = "id"
+    return _fetch_page(table, SEARCH_COLUMNS, after, limit, order_by, descending, params=params)
 
 def delete_product(product_id):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE id = ?", (product_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        barcodes = _barcodes_for_product(conn, product_id)
+        conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+    catalog_cache.invalidate(*barcodes)
 
 def update_product(product_id, name, barcode, price, quantity):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE products SET name = ?, barcode = ?, price = ?, quantity = ? WHERE id = ?",
-                (name, barcode, price, quantity, product_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        old_barcodes = _barcodes_for_product(conn, product_id)
+        conn.execute("UPDATE products SET name = ?, barcode = ?, price = ?, quantity = ? WHERE id = ?",
+                     (name, barcode, price, quantity, product_id))
+    catalog_cache.invalidate(barcode, *old_barcodes)
+
+def _barcodes_for_product(conn, product_id):
+    return [row[0] for row in conn.execute("SELECT barcode FROM products WHERE id = ?", (product_id,))]
+
+def _sync_catalog_cache(conn):
+    # Products written by other tills (or other threads' connections) skip
+    # the invalidations above. PRAGMA data_version is a cheap check that
+    # another connection committed anything; the cache is only dropped if the
+    # products table is among what changed.
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if data_version == getattr(_local, "catalog_data_version", None):
+        return
+    _local.catalog_data_version = data_version
+    version = get_data_version("products")
+    if version != getattr(_local, "catalog_version", None):
+        catalog_cache.clear()
+        _local.catalog_version = version
 
 def get_product_by_barcode(barcode):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products WHERE barcode = ?", (barcode,))
-    product = cur.fetchone()
-    conn.close()
+    _sync_catalog_cache(conn)
+    product = catalog_cache.get(barcode)
+    if is_missing(product):
+        product = conn.execute("SELECT * FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        catalog_cache.put(barcode, product)
     return product
 
+def get_catalog_cache_stats():
+    return catalog_cache.stats()
+
+def _update_summaries(cur, lines, sign=1):
+    # Add (sign=1) or remove (sign=-1) sales lines from the summary tables.
+    # lines: (date, barcode, name, price, quantity, facture_id)
+    daily, hourly, factures = {}, {}, {}
+    for date_, barcode, name, price, quantity, facture_id in lines:
+        quantity *= sign
+        revenue = price * quantity
+        key = (date_[:10], barcode)
+        q, r, _ = daily.get(key, (0, 0.0, name))
+        daily[key] = (q + quantity, r + revenue, name)
+        q, r = hourly.get(date_[:13], (0, 0.0))
+        hourly[date_[:13]] = (q + quantity, r + revenue)
+        if facture_id is not None:
+            n, q, r = factures.get(facture_id, (0, 0, 0.0))
+            factures[facture_id] = (n + sign, q + quantity, r + revenue)
+
+    cur.executemany('''
+        INSERT INTO sales_daily (day, barcode, name, quantity, revenue) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(day, barcode) DO UPDATE SET
+            quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue
+    ''', [(day, barcode, name, q, r) for (day, barcode), (q, r, name) in daily.items()])
+    cur.executemany('''
+        INSERT INTO sales_hourly (hour, quantity, revenue) VALUES (?, ?, ?)
+        ON CONFLICT(hour) DO UPDATE SET
+            quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue
+    ''', [(hour, q, r) for hour, (q, r) in hourly.items()])
+    cur.executemany('''
+        INSERT INTO facture_totals (facture_id, lines, quantity, revenue) VALUES (?, ?, ?, ?)
+        ON CONFLICT(facture_id) DO UPDATE SET
+            lines = lines + excluded.lines, quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    ''', [(facture_id, n, q, r) for facture_id, (n, q, r) in factures.items()])
+
+    if sign < 0:
+        cur.executemany("DELETE FROM sales_daily WHERE day = ? AND barcode = ? AND quantity <= 0", list(daily))
+        cur.executemany("DELETE FROM sales_hourly WHERE hour = ? AND quantity <= 0", [(h,) for h in hourly])
+        cur.executemany("DELETE FROM facture_totals WHERE facture_id = ? AND lines <= 0", [(f,) for f in factures])
+
 def record_sale(barcode, name, price, quantity):
+    now = datetime.now().isoformat()
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO sales (barcode, name, price, quantity, date) VALUES (?, ?, ?, ?, ?)",
-                (barcode, name, price, quantity, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("INSERT INTO sales (barcode, name, price, quantity, date) VALUES (?, ?, ?, ?, ?)",
+                     (barcode, name, price, quantity, now))
+        _update_summaries(conn.cursor(), [(now, barcode, name, price, quantity, None)])
 
 def record_facture(total, filepath):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO factures (total, date, filepath) VALUES (?, ?, ?)",
-                (total, datetime.now().isoformat(), filepath))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("INSERT INTO factures (total, date, filepath) VALUES (?, ?, ?)",
+                     (total, datetime.now().isoformat(), filepath))
 
 def get_sales_history():
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM sales ORDER BY date DESC")
-    sales = cur.fetchall()
-    conn.close()
-    return sales
+    return conn.execute(
+        "SELECT id, barcode, name, price, quantity, date FROM sales ORDER BY date DESC"
+    ).fetchall()
 
 def get_facture_history():
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM factures ORDER BY date DESC")
-    factures = cur.fetchall()
-    conn.close()
-    return factures
+    return conn.execute("SELECT * FROM factures ORDER BY date DESC").fetchall()
+
+SALE_COLUMNS = ("id", "barcode", "name", "price", "quantity", "date")
+FACTURE_COLUMNS = ("id", "total", "date", "filepath")
+
+
+def _history_filters(date_from=None, date_to=None, barcode=None):
+    # date_from / date_to are inclusive ISO days ("YYYY-MM-DD")
+    where, params = [], []
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date < ?")
+        params.append((date.fromisoformat(date_to) + timedelta(days=1)).isoformat())
+    if barcode:
+        where.append("barcode = ?")
+        params.append(barcode)
+    return where, params
+
+def get_sales_page(after=None, limit=500, order_by="date", descending=True,
+                   date_from=None, date_to=None, barcode=None):
+    where, params = _history_filters(date_from, date_to, barcode)
+    return _fetch_page("sales", SALE_COLUMNS, after, limit, order_by, descending, where, params)
+
+def iter_sales(date_from=None, date_to=None, barcode=None, chunk_size=1000):
+    # Export rows: (barcode, name, price, quantity, date), newest first
+    where, params = _history_filters(date_from, date_to, barcode)
+    sql = "SELECT barcode, name, price, quantity, date FROM sales"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return _iter_query(sql + " ORDER BY date DESC, id DESC", params, chunk_size)
+
+def iter_factures(date_from=None, date_to=None, chunk_size=1000):
+    # Export rows: (total, date, filepath), newest first
+    where, params = _history_filters(date_from, date_to)
+    sql = "SELECT total, date, filepath FROM factures"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return _iter_query(sql + " ORDER BY date DESC, id DESC", params, chunk_size)
+
+def get_facture_lines(facture_id):
+    # (name, barcode, price, quantity) of each sales line, to render the facture again
+    conn = get_connection()
+    return conn.execute(
+        "SELECT name, barcode, price, quantity FROM sales WHERE facture_id = ? ORDER BY id", (facture_id,)
+    ).fetchall()
+
+def get_factures_page(after=None, limit=500, order_by="date", descending=True,
+                      date_from=None, date_to=None):
+    where, params = _history_filters(date_from, date_to)
+    return _fetch_page("factures", FACTURE_COLUMNS, after, limit, order_by, descending, where, params)
 
 def delete_product_by_barcode(barcode):
     conn = get_connection()
-    cur = conn.cursor()
+    with conn:
+        cur = conn.cursor()
 
-    # Check if barcode exists
-    cur.execute("SELECT 1 FROM products WHERE barcode = ?", (barcode,))
-    result = cur.fetchone()
+        # Check if barcode exists
+        cur.execute("SELECT 1 FROM products WHERE barcode = ?", (barcode,))
+        result = cur.fetchone()
 
-    if result is None:
-        conn.close()
-        raise ValueError(f"No product found with barcode: {barcode}")
+        if result is None:
+            raise ValueError(f"No product found with barcode: {barcode}")
+
+        # If exists, delete it
+        cur.execute("DELETE FROM products WHERE barcode = ?", (barcode,))
+    catalog_cache.invalidate(barcode)
 
-    # If exists, delete it
-    cur.execute("DELETE FROM products WHERE barcode = ?", (barcode,))
-    conn.commit()
-    conn.close()
 
 
+CART_COLUMNS = "id, name, barcode, price, quantity_to_buy"
+# A cart holds its stock for this long after its last scan or edit, so a
+# till that crashed or was left alone does not block the other tills
+# forever. Checking out an expired cart still works while the stock is there.
+CART_LEASE = timedelta(minutes=20)
 
-def clear_cart():
+
+def _lease_cutoff():
+    return (datetime.now() - CART_LEASE).isoformat()
+
+
+def clear_cart(terminal_id=None):
+    # Expired carts of any till are dropped at the same time
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM cart")
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            "DELETE FROM cart WHERE terminal_id = ? OR updated_at IS NULL OR updated_at < ?",
+            (terminal_id or TERMINAL_ID, _lease_cutoff())
+        )
 
-def get_cart_items():
+def get_cart_items(terminal_id=None):
+    conn = get_connection()
+    return conn.execute(
+        f"SELECT {CART_COLUMNS} FROM cart WHERE terminal_id = ?", (terminal_id or TERMINAL_ID,)
+    ).fetchall()
+
+def get_cart_items_by_barcodes(barcodes, terminal_id=None):
+    barcodes = list(barcodes)
+    if not barcodes:
+        return []
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM cart")
-    items = cur.fetchall()
-    conn.close()
-    return items
+    return conn.execute(
+        f"SELECT {CART_COLUMNS} FROM cart WHERE terminal_id = ? AND barcode IN ({_placeholders(barcodes)})",
+        [terminal_id or TERMINAL_ID, *barcodes]
+    ).fetchall()
 
-def add_to_cart_or_increment(barcode):
+def remove_from_cart(barcode, terminal_id=None):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM cart WHERE terminal_id = ? AND barcode = ?", (terminal_id or TERMINAL_ID, barcode))
+
+PRODUCT_NOT_FOUND = "This product does not exist in the database."
+NOT_ENOUGH_STOCK = "Not enough stock to add this product."
+EXCEEDS_STOCK = "Quantity to buy exceeds stock available."
+
+
+def _available_stock(cur, barcodes, terminal_id):
+    # barcode -> (name, price, stock not reserved by another unexpired cart,
+    # quantity already in this cart), read inside a write transaction
+    cur.execute(
+        f"""
+        SELECT p.barcode, p.name, p.price,
+               p.quantity - COALESCE((SELECT SUM(c.quantity_to_buy) FROM cart c
+                                      WHERE c.barcode = p.barcode AND c.terminal_id != ?
+                                        AND c.updated_at >= ?), 0),
+               COALESCE((SELECT c.quantity_to_buy FROM cart c
+                         WHERE c.barcode = p.barcode AND c.terminal_id = ?), 0)
+        FROM products p WHERE p.barcode IN ({_placeholders(barcodes)})
+        """,
+        [terminal_id, _lease_cutoff(), terminal_id, *barcodes]
+    )
+    return {row[0]: row[1:] for row in cur.fetchall()}
+
+def _renew_cart(cur, terminal_id):
+    # Any scan or edit extends the lease of the whole cart
+    cur.execute("UPDATE cart SET updated_at = ? WHERE terminal_id = ?", (datetime.now().isoformat(), terminal_id))
+
+def set_cart_quantity(barcode, quantity, terminal_id=None):
+    terminal_id = terminal_id or TERMINAL_ID
     conn = get_connection()
-    cur = conn.cursor()
+    with _write_transaction(conn) as cur:
+        product = _available_stock(cur, [barcode], terminal_id).get(barcode)
+        if product is None:
+            raise ValueError(PRODUCT_NOT_FOUND)
+        available_qty = product[2]
+        if quantity > available_qty:
+            raise ValueError(f"Only {max(0, available_qty)} items available in stock.")
+        cur.execute(
+            "UPDATE cart SET quantity_to_buy = ? WHERE terminal_id = ? AND barcode = ?",
+            (quantity, terminal_id, barcode)
+        )
+        _renew_cart(cur, terminal_id)
+
+
+def add_many_to_cart(barcodes, terminal_id=None):
+    # Apply a burst of scans in one transaction. Scans are grouped by barcode so
+    # stock is checked once per product, and every scan beyond the available
+    # stock is rejected rather than lost silently. Stock is read fresh under
+    # the write lock (not from the catalog cache), minus what other tills
+    # already hold in their carts, so two tills can never reserve the same unit.
+    # terminal_id fills another cart than this till's own (see scanner routes).
+    scans = {}
+    for barcode in barcodes:
+        scans[barcode] = scans.get(barcode, 0) + 1
+    if not scans:
+        return {}
+
+    terminal_id = terminal_id or TERMINAL_ID
+    conn = get_connection()
+    with _write_transaction(conn) as cur:
+        products = _available_stock(cur, list(scans), terminal_id)
+        results = {}
+        cart_rows = []
+        for barcode, count in scans.items():
+            product = products.get(barcode)
+            if product is None:
+                results[barcode] = {"accepted": 0, "rejected": count, "error": PRODUCT_NOT_FOUND}
+                continue
+            name, price, available_qty, current_qty = product
+            accepted = max(0, min(count, available_qty - current_qty))
+            error = None
+            if accepted < count:
+                error = EXCEEDS_STOCK if current_qty + accepted else NOT_ENOUGH_STOCK
+            results[barcode] = {"accepted": accepted, "rejected": count - accepted, "error": error}
+            if accepted:
+                cart_rows.append((terminal_id, name, barcode, price, accepted))
+
+        cur.executemany(
+            """
+            INSERT INTO cart (terminal_id, name, barcode, price, quantity_to_buy) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(terminal_id, barcode) DO UPDATE SET quantity_to_buy = quantity_to_buy + excluded.quantity_to_buy
+            """,
+            cart_rows
+        )
+        if cart_rows:
+            _renew_cart(cur, terminal_id)
+    return results
+
+
+def add_to_cart_or_increment(barcode, terminal_id=None):
+    result = add_many_to_cart([barcode], terminal_id)[barcode]
+    if result["rejected"] and result["error"] != PRODUCT_NOT_FOUND:
+        raise ValueError(result["error"])
 
-    # Get available quantity
-    cur.execute("SELECT quantity FROM products WHERE barcode = ?", (barcode,))
-    product_qty_row = cur.fetchone()
-    if product_qty_row is None:
-        conn.close()
-        return  # Product doesn't exist
-    available_qty = product_qty_row[0]
-
-    # Get current quantity in cart
-    cur.execute("SELECT quantity_to_buy FROM cart WHERE barcode = ?", (barcode,))
-    cart_row = cur.fetchone()
-
-    if cart_row:
-        new_qty = cart_row[0] + 1
-        if new_qty > available_qty:
-            conn.close()
-            raise ValueError("Quantity to buy exceeds stock available.")
-        cur.execute("UPDATE cart SET quantity_to_buy = ? WHERE barcode = ?", (new_qty, barcode))
-    else:
-        if 1 > available_qty:
-            conn.close()
-            raise ValueError("Not enough stock to add this product.")
-        cur.execute("SELECT name, price FROM products WHERE barcode = ?", (barcode,))
-        product = cur.fetchone()
-        if product:
-            name, price = product
-            cur.execute(
-                "INSERT INTO cart (name, barcode, price, quantity_to_buy) VALUES (?, ?, ?, ?)",
-                (name, barcode, price, 1)
-            )
 
-    conn.commit()
-    conn.close()
+def _take_stock(cur, cart_items):
+    # Decrement stock only where enough is left; a shortfall (stock lowered
+    # by an edit since the cart was filled) rolls the whole sale back.
+    for _, name, barcode, price, quantity in cart_items:
+        cur.execute(
+            "UPDATE products SET quantity = quantity - ? WHERE barcode = ? AND quantity >= ?",
+            (quantity, barcode, quantity)
+        )
+        if cur.rowcount != 1:
+            raise ValueError(f"Not enough stock left for {name} ({barcode}).")
 
 
 def decrement_stock_after_sale(cart_items):
     conn = get_connection()
-    cur = conn.cursor()
-    for _, name, barcode, price, quantity in cart_items:
-        cur.execute("UPDATE products SET quantity = quantity - ? WHERE barcode = ?", (quantity, barcode))
-    conn.commit()
-    conn.close()
+    with _write_transaction(conn) as cur:
+        _take_stock(cur, cart_items)
+    catalog_cache.invalidate(*(item[2] for item in cart_items))
 
 
-def cancel_sale(barcode, quantity, date):
+def checkout(cart_items, filepath, terminal_id=None):
+    # Sales lines, stock, facture and cart are written in one transaction so a
+    # crash can never leave them out of sync.
+    now = datetime.now().isoformat()
+    total = sum(price * quantity for _, name, barcode, price, quantity in cart_items)
     conn = get_connection()
-    cur = conn.cursor()
+    with _write_transaction(conn) as cur:
+        _take_stock(cur, cart_items)
+        cur.execute("INSERT INTO factures (total, date, filepath) VALUES (?, ?, ?)",
+                    (total, now, filepath))
+        facture_id = cur.lastrowid
+        lines = [(now, barcode, name, price, quantity, facture_id) for _, name, barcode, price, quantity in cart_items]
+        cur.executemany(
+            "INSERT INTO sales (date, barcode, name, price, quantity, facture_id) VALUES (?, ?, ?, ?, ?, ?)",
+            lines
+        )
+        _update_summaries(cur, lines)
+        cur.execute("DELETE FROM cart WHERE terminal_id = ?", (terminal_id or TERMINAL_ID,))
+    catalog_cache.invalidate(*(item[2] for item in cart_items))
+    return facture_id
 
-    # 1. Delete sale line by barcode and exact datetime
-    cur.execute("DELETE FROM sales WHERE barcode = ? AND date = ?", (barcode, date))
 
-    # 2. Increment stock in products table
-    cur.execute("UPDATE products SET quantity = quantity + ? WHERE barcode = ?", (quantity, barcode))
+def set_facture_path(facture_id, filepath):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE factures SET filepath = ? WHERE id = ?", (filepath, facture_id))
 
-    conn.commit()
-    conn.close()
 
+def cancel_sale(sale_id):
+    # Under the write lock, so two tills cancelling the same line cannot both
+    # put its stock back
+    conn = get_connection()
+    with _write_transaction(conn) as cur:
+        cur.execute("SELECT date, barcode, name, price, quantity, facture_id FROM sales WHERE id = ?", (sale_id,))
+        sale = cur.fetchone()
+        if sale is None:
+            raise ValueError(f"No sale found with id: {sale_id}")
+        _, barcode, _, _, quantity, facture_id = sale
+
+        # 1. Delete the sale line
+        cur.execute("DELETE FROM sales WHERE id = ?", (sale_id,))
+
+        # 2. Increment stock in products table
+        cur.execute("UPDATE products SET quantity = quantity + ? WHERE barcode = ?", (quantity, barcode))
+
+        # 3. Take it out of the summary tables
+        _update_summaries(cur, [sale], sign=-1)
+
+        # 4. Its facture now totals the lines left on it
+        if facture_id is not None:
+            cur.execute('''
+                UPDATE factures SET total = (
+                    SELECT COALESCE(SUM(price * quantity), 0) FROM sales WHERE facture_id = ?
+                ) WHERE id = ?
+            ''', (facture_id, facture_id))
+    catalog_cache.invalidate(barcode)
+
+
+def cancel_facture(facture_id):
+    # Cancel every sales line of a facture at once and put the stock back
+    conn = get_connection()
+    with _write_transaction(conn) as cur:
+        if cur.execute("SELECT 1 FROM factures WHERE id = ?", (facture_id,)).fetchone() is None:
+            raise ValueError(f"No facture found with id: {facture_id}")
+        lines = cur.execute(
+            "SELECT date, barcode, name, price, quantity, facture_id FROM sales WHERE facture_id = ?", (facture_id,)
+        ).fetchall()
+        if not lines:
+            # Deleting the facture alone would put no stock back
+            raise ValueError(f"Facture {facture_id} has no sales lines linked to it; cancel its sales one by one.")
+        barcodes = {line[1] for line in lines}
+        cur.execute('''
+            UPDATE products
+            SET quantity = quantity + (
+                SELECT SUM(s.quantity) FROM sales s
+                WHERE s.facture_id = ? AND s.barcode = products.barcode
+            )
+            WHERE barcode IN (SELECT barcode FROM sales WHERE facture_id = ?)
+        ''', (facture_id, facture_id))
+        cur.execute("DELETE FROM sales WHERE facture_id = ?", (facture_id,))
+        cur.execute("DELETE FROM factures WHERE id = ?", (facture_id,))
+        _update_summaries(cur, lines, sign=-1)
+    catalog_cache.invalidate(*barcodes)
 
 
-def delete_facture_by_path(filepath):
+def delete_facture(facture_id):
+    # Removes the facture record only; its sales lines stay in the history
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM factures WHERE filepath = ?", (filepath,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE sales SET facture_id = NULL WHERE facture_id = ?", (facture_id,))
+        conn.execute("DELETE FROM factures WHERE id = ?", (facture_id,))
+        conn.execute("DELETE FROM facture_totals WHERE facture_id = ?", (facture_id,))
+
+
+# Per-call timings of the public functions above as "db.<name>" (opt-in, see
+# services/metrics.py). The iter_* exports are lazy, so timing the call would
+# say nothing.
+metrics.instrument(
+    globals(), "db", exclude=("get_connection", "close_connection", "set_terminal_id", "set_journal_mode", "journal_mode", "is_network_path", "iter_products", "iter_sales", "iter_factures")
+)
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from services.database import set_facture_path
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 0.5  # seconds, multiplied by the attempt number
+
+
+# Renders facture PDFs on a worker thread so the till never waits for
+# ReportLab. The facture row is recorded at checkout with no file; its path
+# is filled in once the PDF has been written.
+class FactureRenderer(QObject):
+    rendered = pyqtSignal(int, str)  # facture id, pdf path
+    failed = pyqtSignal(int, str)    # facture id, error message
+
+    def __init__(self, max_workers=1):
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="facture-pdf")
+
+    def submit(self, facture_id, operation_id, items, output_path, date=None):
+        return self._executor.submit(self._render, facture_id, operation_id, list(items), output_path, date)
+
+    def shutdown(self):
+        # Let queued factures finish before the app exits
+        self._executor.shutdown(wait=True)
+
+    def _render(self, facture_id, operation_id, items, output_path, date):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                # ReportLab is only imported once the first facture is
+                # rendered; a failing import is reported like any other error
+                from services.pdf_generator import generate_facture_pdf
+                filepath = generate_facture_pdf(operation_id, items, output_path, date)
+                set_facture_path(facture_id, filepath)
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    self.failed.emit(facture_id, str(e))
+                    raise
+                time.sleep(RETRY_DELAY * attempt)
+            else:
+                self.rendered.emit(facture_id, filepath)
+                return filepath
+
+
+_renderer = None
+
+
+def get_facture_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = FactureRenderer()
+    return _renderer
@@ -0,0 +1,156 @@
+import inspect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+METRICS_FILE = "metrics.log"
+MAX_FILE_BYTES = 1024 * 1024
+BACKUP_FILES = 3
+DUMP_INTERVAL = 60.0  # seconds between dumps to METRICS_FILE
+
+# Log-scale latency buckets: each is 5% wider than the previous one, so
+# percentiles are within 5% and a histogram never grows past a few hundred
+# counters whatever the number of calls.
+MIN_SECONDS = 1e-7
+GROWTH = 1.05
+_LOG_GROWTH = math.log(GROWTH)
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = int(math.log(max(seconds, MIN_SECONDS) / MIN_SECONDS) / _LOG_GROWTH)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p):
+        # Upper bound of the bucket holding the p-th call, capped by the max
+        rank = p * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(MIN_SECONDS * GROWTH ** (bucket + 1), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+# Opt-in per-call latency metrics for the hot paths (main.py --metrics, or
+# BARCODE_METRICS=1). Instrumentation is applied when the instrumented module
+# is imported: while disabled, timed() returns the function unchanged, so
+# there is no cost at all. Enable before importing the services.
+class Metrics:
+    def __init__(self):
+        self.enabled = bool(os.environ.get("BARCODE_METRICS"))
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        self._dump_stop = threading.Event()
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def timed(self, name):
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def measure(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def instrument(self, namespace, prefix, exclude=()):
+        # Wrap every public function defined in a module namespace
+        # (pass globals()), e.g. database.checkout -> "db.checkout"
+        if not self.enabled:
+            return
+        for name, value in list(namespace.items()):
+            if (name.startswith("_") or name in exclude or not inspect.isfunction(value)
+                    or value.__module__ != namespace["__name__"]):
+                continue
+            namespace[name] = self.timed(f"{prefix}.{name}")(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def dump(self, path=METRICS_FILE):
+        # Append one JSON line; the file is rotated at MAX_FILE_BYTES
+        if self._logger is None:
+            handler = RotatingFileHandler(path, maxBytes=MAX_FILE_BYTES, backupCount=BACKUP_FILES)
+            self._logger = logging.getLogger("barcode_master.metrics")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+        record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": self.snapshot()}
+        self._logger.info(json.dumps(record))
+
+    def start_dumping(self, interval=DUMP_INTERVAL):
+        if not self.enabled:
+            return
+
+        def run():
+            while not self._dump_stop.wait(interval):
+                self.dump()
+
+        threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+
+    def stop_dumping(self):
+        if self.enabled:
+            self._dump_stop.set()
+            self.dump()
+
+
+metrics = Metrics()
@@ -0,0 +1,265 @@
+# Ordered schema migrations, tracked with PRAGMA user_version.
+#
+# Each migration is (version, description, steps); a step is either an SQL
+# string or a function taking a cursor. Migrations newer than the database's
+# user_version are applied in order, each in its own transaction, so an
+# existing shop database is upgraded in place at startup. Never edit a
+# released migration: append a new one instead.
+
+import sqlite3
+
+# Keep products_fts in sync with products (name -> SQL)
+PRODUCTS_FTS_TRIGGERS = {
+    "products_fts_insert": '''
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+        END
+    ''',
+    "products_fts_delete": '''
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, barcode) VALUES ('delete', old.id, old.name, old.barcode);
+        END
+    ''',
+    "products_fts_update": '''
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, barcode ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, barcode) VALUES ('delete', old.id, old.name, old.barcode);
+            INSERT INTO products_fts (rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+        END
+    ''',
+}
+
+# Tables whose writes are counted in table_versions (database.get_data_version),
+# and the triggers counting them (name -> SQL)
+VERSIONED_TABLES = ("products", "sales", "factures", "cart")
+VERSION_TRIGGERS = {
+    f"{table}_version_{event.lower()}": f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+    '''
+    for table in VERSIONED_TABLES for event in ("INSERT", "UPDATE", "DELETE")
+}
+
+
+def _create_products_fts(cur):
+    # External-content FTS5 index over products, with prefix indexes for
+    # as-you-type search. SQLite builds without FTS5 skip it and
+    # database.search_products_page falls back to LIKE.
+    try:
+        cur.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, barcode, content='products', content_rowid='id', prefix='1 2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        return
+    for trigger in PRODUCTS_FTS_TRIGGERS.values():
+        cur.execute(trigger)
+    cur.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def _create_table_versions(cur):
+    # One row per table, bumped by triggers on every insert, update and
+    # delete, so each till can tell which tables any till (or the sqlite3
+    # shell) has written since it last looked
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table in VERSIONED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (table,))
+    for trigger in VERSION_TRIGGERS.values():
+        cur.execute(trigger)
+
+
+MIGRATIONS = [
+    (1, "base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            barcode TEXT UNIQUE,
+            price REAL,
+            quantity INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT,
+            name TEXT,
+            price REAL,
+            quantity INTEGER,
+            date TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS factures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            total REAL,
+            date TEXT,
+            filepath TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cart (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            barcode TEXT UNIQUE,
+            price REAL,
+            quantity_to_buy INTEGER
+        )
+        ''',
+    ]),
+    (2, "performance indexes", [
+        # Sortable product columns for the paged catalog view
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)",
+        "CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)",
+        # History pages, date / barcode filters and facture lookups
+        "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_barcode_date ON sales(barcode, date)",
+        "CREATE INDEX IF NOT EXISTS idx_factures_date ON factures(date)",
+        "CREATE INDEX IF NOT EXISTS idx_factures_filepath ON factures(filepath)",
+        "ANALYZE",
+    ]),
+    (3, "link sales to factures", [
+        "ALTER TABLE sales ADD COLUMN facture_id INTEGER REFERENCES factures(id)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_facture ON sales(facture_id)",
+        # checkout() stamps a facture and its sales lines with the same date
+        '''
+        UPDATE sales SET facture_id = (SELECT MIN(f.id) FROM factures f WHERE f.date = sales.date)
+        WHERE facture_id IS NULL
+        ''',
+    ]),
+    (4, "sales summary tables", [
+        # Kept up to date by checkout / cancel in database.py so reports read
+        # O(days) summary rows instead of scanning every sale.
+        '''
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT,
+            barcode TEXT,
+            name TEXT,
+            quantity INTEGER,
+            revenue REAL,
+            PRIMARY KEY (day, barcode)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sales_hourly (
+            hour TEXT PRIMARY KEY,
+            quantity INTEGER,
+            revenue REAL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS facture_totals (
+            facture_id INTEGER PRIMARY KEY,
+            lines INTEGER,
+            quantity INTEGER,
+            revenue REAL
+        )
+        ''',
+        '''
+        INSERT OR REPLACE INTO sales_daily (day, barcode, name, quantity, revenue)
+        SELECT substr(date, 1, 10), barcode, MAX(name), SUM(quantity), SUM(price * quantity)
+        FROM sales GROUP BY substr(date, 1, 10), barcode
+        ''',
+        '''
+        INSERT OR REPLACE INTO sales_hourly (hour, quantity, revenue)
+        SELECT substr(date, 1, 13), SUM(quantity), SUM(price * quantity)
+        FROM sales GROUP BY substr(date, 1, 13)
+        ''',
+        '''
+        INSERT OR REPLACE INTO facture_totals (facture_id, lines, quantity, revenue)
+        SELECT facture_id, COUNT(*), SUM(quantity), SUM(price * quantity)
+        FROM sales WHERE facture_id IS NOT NULL GROUP BY facture_id
+        ''',
+    ]),
+    (5, "product search index", [_create_products_fts]),
+    (6, "per-terminal carts", [
+        # One cart per till sharing the database (database.TERMINAL_ID). The
+        # old shared cart is emptied at every scan start, so it is not kept.
+        '''
+        CREATE TABLE cart_by_terminal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            terminal_id TEXT NOT NULL DEFAULT '',
+            name TEXT,
+            barcode TEXT,
+            price REAL,
+            quantity_to_buy INTEGER,
+            UNIQUE (terminal_id, barcode)
+        )
+        ''',
+        "DROP TABLE cart",
+        "ALTER TABLE cart_by_terminal RENAME TO cart",
+        # Stock reserved by the other tills' carts, see database._available_stock
+        "CREATE INDEX IF NOT EXISTS idx_cart_barcode ON cart(barcode)",
+    ]),
+    (7, "link pre-checkout sales to factures", [
+        # Before checkout() the sales lines and then the facture were written
+        # with separate datetime.now() calls, a few ms apart, so migration 3
+        # found no exact date match. Link each unlinked sale to the first
+        # facture written within a second after it, skipping factures that
+        # already have lines (facture_totals).
+        '''
+        UPDATE sales SET facture_id = (
+            SELECT f.id FROM factures f
+            WHERE f.date >= sales.date
+              AND f.date <= strftime('%Y-%m-%dT%H:%M:%f', sales.date, '+1 seconds')
+              AND f.id NOT IN (SELECT facture_id FROM facture_totals)
+            ORDER BY f.date, f.id LIMIT 1
+        )
+        WHERE facture_id IS NULL
+        ''',
+        '''
+        INSERT OR REPLACE INTO facture_totals (facture_id, lines, quantity, revenue)
+        SELECT facture_id, COUNT(*), SUM(quantity), SUM(price * quantity)
+        FROM sales WHERE facture_id IS NOT NULL
+          AND facture_id NOT IN (SELECT facture_id FROM facture_totals)
+        GROUP BY facture_id
+        ''',
+    ]),
+    (8, "cart reservation lease", [
+        # Last scan or edit of the cart (database.CART_LEASE); rows without
+        # one are treated as expired
+        "ALTER TABLE cart ADD COLUMN updated_at TEXT",
+    ]),
+    (9, "per-table write versions", [_create_table_versions]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    current = get_schema_version(conn)
+    if current > LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this app supports ({LATEST_VERSION})"
+        )
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+            cur.execute(f"PRAGMA user_version = {version}")
+        except Exception as e:
+            conn.rollback()
+            raise RuntimeError(f"Migration {version} ({description}) failed: {e}") from e
+        conn.commit()
+        current = version
+    return current
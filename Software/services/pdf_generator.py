@@ -7,49 +7,118 @@ from reportlab.pdfgen import canvas
 from datetime import datetime
 import os
 
-def generate_facture_pdf(operation_id, scanned_items, output_path):
-    filename = os.path.join(output_path, f"facture_{operation_id}.pdf")
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, "Barcode Master - Facture")
-
-    c.setFont("Helvetica", 12)
-    c.drawString(50, height - 80, f"Facture ID: {operation_id}")
-    c.drawString(50, height - 100, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Table headers
-    headers = ["Name", "Barcode", "Price", "Quantity", "Total"]
-    col_widths = [100, 120, 60, 60, 60]
-    x_start = 50
-    y = height - 140
-
-    c.setFont("Helvetica-Bold", 11)
-    for i, header in enumerate(headers):
-        c.drawString(x_start + sum(col_widths[:i]), y, header)
-
-    y -= 20
-    total_price = 0
-
-    c.setFont("Helvetica", 10)
-    for item in scanned_items:
-        name, barcode, price, quantity = item
-        total = price * quantity
-        total_price += total
-
-        values = [name, barcode, f"{price:.2f}", str(quantity), f"{total:.2f}"]
-        for i, value in enumerate(values):
-            c.drawString(x_start + sum(col_widths[:i]), y, value)
-        y -= 20
-        if y < 100:  # Go to next page if needed
-            c.showPage()
-            y = height - 50
-
-    # Total summary
-    y -= 10
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x_start, y, f"Total to Pay: {total_price:.2f} TND")
-
-    c.save()
-    return filename
+from services.metrics import metrics
+
+HEADERS = ["Name", "Barcode", "Price", "Quantity", "Total"]
+COL_WIDTHS = [100, 120, 60, 60, 60]
+X_START = 50
+LINE_HEIGHT = 20
+PAGE_BOTTOM = 100
+TITLE = "Barcode Master - Facture"
+TITLE_FORM = "facture_title"
+COLUMNS_FORM = "facture_columns"
+
+
+# Layout of a facture, computed once and shared by every receipt. The static
+# parts (title, table column headers) are drawn once per PDF as ReportLab
+# forms and placed with doForm: the title on the first page, the column
+# headers on every page. Form XObjects belong to one document, so each
+# receipt file defines them once. Rows are drawn with a single text object
+# per page instead of one drawString call per cell.
+class FactureTemplate:
+    def __init__(self, pagesize=A4, headers=HEADERS, col_widths=COL_WIDTHS, x_start=X_START):
+        self.pagesize = pagesize
+        self.width, self.height = pagesize
+        self.headers = headers
+        self.x_start = x_start
+        self.column_x = [x_start + sum(col_widths[:i]) for i in range(len(col_widths))]
+        self.table_top = self.height - 140
+        self.continuation_top = self.height - 50
+
+    def _define_forms(self, c):
+        c.beginForm(TITLE_FORM)
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(self.x_start, self.height - 50, TITLE)
+        c.endForm()
+
+        # Column headers on a baseline at y=0, moved into place by _draw_columns
+        c.beginForm(COLUMNS_FORM, lowery=-LINE_HEIGHT, uppery=LINE_HEIGHT)
+        text = c.beginText()
+        text.setFont("Helvetica-Bold", 11)
+        for x, header in zip(self.column_x, self.headers):
+            text.setTextOrigin(x, 0)
+            text.textOut(header)
+        c.drawText(text)
+        c.endForm()
+
+    def _draw_columns(self, c, y):
+        c.saveState()
+        c.translate(0, y)
+        c.doForm(COLUMNS_FORM)
+        c.restoreState()
+
+    def _draw_header(self, c, operation_id, date):
+        c.doForm(TITLE_FORM)
+        text = c.beginText()
+        text.setFont("Helvetica", 12)
+        text.setTextOrigin(self.x_start, self.height - 80)
+        text.textOut(f"Facture ID: {operation_id}")
+        text.setTextOrigin(self.x_start, self.height - 100)
+        text.textOut(f"Date: {date.strftime('%Y-%m-%d %H:%M:%S')}")
+        c.drawText(text)
+        self._draw_columns(c, self.table_top)
+
+    def render(self, operation_id, scanned_items, output_path, date=None):
+        # date: when the sale was recorded (a re-rendered facture keeps its
+        # own date); now by default
+        filename = os.path.join(output_path, f"facture_{operation_id}.pdf")
+        c = canvas.Canvas(filename, pagesize=self.pagesize)
+        self._define_forms(c)
+        self._draw_header(c, operation_id, date or datetime.now())
+
+        # One text object per page instead of one per cell
+        y = self.table_top - LINE_HEIGHT
+        total_price = 0
+        text = c.beginText()
+        text.setFont("Helvetica", 10)
+        column_x = self.column_x
+        for name, barcode, price, quantity in scanned_items:
+            total = price * quantity
+            total_price += total
+
+            values = (name, barcode, f"{price:.2f}", str(quantity), f"{total:.2f}")
+            for x, value in zip(column_x, values):
+                text.setTextOrigin(x, y)
+                text.textOut(value)
+            y -= LINE_HEIGHT
+            if y < PAGE_BOTTOM:  # Go to next page if needed
+                c.drawText(text)
+                c.showPage()
+                self._draw_columns(c, self.continuation_top)
+                y = self.continuation_top - LINE_HEIGHT
+                text = c.beginText()
+                text.setFont("Helvetica", 10)
+        c.drawText(text)
+
+        # Total summary
+        y -= 10
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(self.x_start, y, f"Total to Pay: {total_price:.2f} TND")
+
+        c.save()
+        return filename
+
+
+_template = FactureTemplate()
+
+
+@metrics.timed("pdf.facture")
+def generate_facture_pdf(operation_id, scanned_items, output_path, date=None):
+    return _template.render(operation_id, scanned_items, output_path, date)
+
+
+@metrics.timed("pdf.factures_batch")
+def generate_facture_pdfs(jobs, output_path):
+    # Render a batch of (operation_id, scanned_items) receipts, one PDF each,
+    # with the shared layout
+    return [_template.render(operation_id, items, output_path) for operation_id, items in jobs]
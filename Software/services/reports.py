@@ -0,0 +1,86 @@
+from datetime import date
+
+from services.database import get_connection
+
+# Reports read the summary tables maintained by database.checkout/cancel_*
+# (sales_daily, sales_hourly, facture_totals), so their cost grows with the
+# number of days reported, not with the number of sales.
+# date_from / date_to are inclusive ISO days ("YYYY-MM-DD").
+
+
+def _day_range(date_from, date_to, column="day"):
+    where, params = [], []
+    if date_from:
+        where.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append(f"{column} <= ?")
+        params.append(date_to)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+def get_daily_report(date_from=None, date_to=None):
+    # [(day, items sold, revenue)], newest first
+    where, params = _day_range(date_from, date_to)
+    return get_connection().execute(
+        f"SELECT day, SUM(quantity), SUM(revenue) FROM sales_daily{where} GROUP BY day ORDER BY day DESC",
+        params
+    ).fetchall()
+
+
+def get_product_report(date_from=None, date_to=None, limit=50):
+    # [(barcode, name, items sold, revenue)], best sellers first
+    where, params = _day_range(date_from, date_to)
+    return get_connection().execute(
+        f"""
+        SELECT barcode, MAX(name), SUM(quantity), SUM(revenue) FROM sales_daily{where}
+        GROUP BY barcode ORDER BY SUM(revenue) DESC LIMIT ?
+        """,
+        params + [limit]
+    ).fetchall()
+
+
+def get_hourly_report(day):
+    # [(hour "HH", items sold, revenue)] for one day
+    return get_connection().execute(
+        "SELECT substr(hour, 12, 2), quantity, revenue FROM sales_hourly "
+        "WHERE hour >= ? AND hour < ? ORDER BY hour",
+        (f"{day}T", f"{day}U")
+    ).fetchall()
+
+
+def get_summary(date_from=None, date_to=None):
+    where, params = _day_range(date_from, date_to)
+    quantity, revenue = get_connection().execute(
+        f"SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(revenue), 0) FROM sales_daily{where}", params
+    ).fetchone()
+
+    # Facture counts come from the facture dates (factures.date is indexed)
+    where, params = [], []
+    if date_from:
+        where.append("f.date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("f.date < ?")
+        params.append(f"{date_to}U")  # any time on date_to sorts before "U"
+    sql = "SELECT COUNT(*) FROM factures f JOIN facture_totals t ON t.facture_id = f.id"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    factures = get_connection().execute(sql, params).fetchone()[0]
+
+    return {
+        "items": quantity,
+        "revenue": revenue,
+        "factures": factures,
+        "average_basket": revenue / factures if factures else 0.0,
+    }
+
+
+def get_end_of_day_summary(day=None):
+    day = day or date.today().isoformat()
+    return get_summary(day, day)
+
+
+def get_month_to_date_summary(today=None):
+    today = today or date.today()
+    return get_summary(today.replace(day=1).isoformat(), today.isoformat())
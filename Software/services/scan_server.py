@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import threading
+import time
+
+from services.barcode_line import parse_barcode
+
+# Scans are not authenticated: anyone who can reach the port can fill a
+# cart, or claim a routed device with HELLO. Listen on this PC only unless a
+# LAN address is given explicitly (main.py --scan-server 0.0.0.0:5577).
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5577
+
+# Wire protocol (TCP stream or UDP datagrams, UTF-8, one record per line):
+#   HELLO <device_id>          optional, names the device sending the scans
+#   <barcode> | <timestamp>    same line format the phone writes to barcode.txt
+# Every complete line received in one read (TCP) or datagram (UDP) is handed on
+# as one batch. TCP is answered with "ACK <scans received on this connection>",
+# UDP with "ACK <scans in this datagram>".
+
+
+def parse_lines(lines, device_id):
+    barcodes = []
+    for raw in lines:
+        line = raw.decode(errors='replace').strip()
+        if not line:
+            continue
+        if line.startswith("HELLO "):
+            device_id = line[6:].strip() or device_id
+            continue
+        barcode = parse_barcode(line)
+        if barcode:
+            barcodes.append(barcode)
+    return device_id, barcodes
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        device_id, barcodes = parse_lines(data.split(b"\n"), f"{addr[0]}:{addr[1]}")
+        if barcodes:
+            self.server.on_scans(device_id, barcodes)
+        self.transport.sendto(f"ACK {len(barcodes)}\n".encode(), addr)
+
+
+# Accepts scans from phones (or the simulator) over the local network and
+# passes each batch to on_scans(device_id, barcodes) from its own thread.
+class ScanServer:
+    def __init__(self, on_scans, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.on_scans = on_scans
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._tcp_server = None
+        self._udp_transport = None
+        self._error = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="scan-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+        if self._error:
+            raise self._error
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._listen())
+        except OSError as e:
+            self._error = e
+            if self._tcp_server:
+                self._tcp_server.close()
+            self._loop.close()
+            return
+        finally:
+            self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._tcp_server.close()
+            self._udp_transport.close()
+            self._loop.run_until_complete(self._tcp_server.wait_closed())
+            self._loop.close()
+
+    async def _listen(self):
+        self._tcp_server = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        self._udp_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _UdpProtocol(self), local_addr=(self.host, self.port)
+        )
+
+    async def _handle_tcp(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        device_id = f"{peer[0]}:{peer[1]}" if peer else "tcp"
+        received = 0
+        pending = b""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                device_id, barcodes = parse_lines(lines, device_id)
+                if barcodes:
+                    received += len(barcodes)
+                    self.on_scans(device_id, barcodes)
+                writer.write(f"ACK {received}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    # Headless sink for load tests: python -m services.scan_server [port] [--cart DB_FILE]
+    # By default scans are only counted. With --cart each device's scans go
+    # through database.add_many_to_cart into the cart named after the device in DB_FILE (use
+    # a copy of the shop database: stock is reserved as in the app), so the
+    # simulator measures the database path too.
+    parser = argparse.ArgumentParser(description="Count (or add to carts) the scans received.")
+    parser.add_argument("port", type=int, nargs="?", default=DEFAULT_PORT)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--cart", metavar="DB_FILE", help="add the scans to per-device carts in this database")
+    args = parser.parse_args()
+    counts = {"scans": 0, "accepted": 0, "rejected": 0}
+    timings = []
+    devices = set()
+
+    def count(device_id, barcodes):
+        counts["scans"] += len(barcodes)
+
+    def add_to_cart(device_id, barcodes):
+        devices.add(device_id)
+        started = time.perf_counter()
+        results = database.add_many_to_cart(barcodes, device_id)
+        timings.append(time.perf_counter() - started)
+        counts["scans"] += len(barcodes)
+        counts["rejected"] += sum(result["rejected"] for result in results.values())
+        counts["accepted"] = counts["scans"] - counts["rejected"]
+
+    if args.cart:
+        from services import database
+        database.DB_FILE = args.cart
+        database.init_db()
+
+    server = ScanServer(add_to_cart if args.cart else count, args.host, args.port)
+    server.start()
+    print(f"Listening for scans on {server.host}:{server.port} (Ctrl+C to stop)")
+    try:
+        last = 0
+        while True:
+            time.sleep(1)
+            total = counts["scans"]
+            line = f"{total - last} scans/s, {total} total"
+            if args.cart:
+                recent, timings = sorted(timings), []
+                line += f", {counts['accepted']} accepted, {counts['rejected']} rejected"
+                if recent:
+                    p50 = recent[len(recent) // 2] * 1000
+                    p99 = recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000
+                    line += f", add_many_to_cart p50 {p50:.2f} ms p99 {p99:.2f} ms"
+            print(line)
+            last = total
+    except KeyboardInterrupt:
+        server.stop()
+        if args.cart:
+            # The carts were only there to be measured; give their stock back
+            for device_id in devices:
+                database.clear_cart(device_id)
+            database.close_connection()
+
+if __name__ == "__main__":
+    main()
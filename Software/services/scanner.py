@@ -0,0 +1,339 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from services.barcode_line import parse_barcode, parse_scan_time
+from services.metrics import metrics
+
+BARCODE_FILE = "/sdcard/barcode.txt"
+RECONNECT_DELAY = 1.0  # seconds between attempts while the phone is unplugged
+
+
+def adb_subprocess_kwargs():
+    # Hidden cmd window on Windows
+    if os.name != "nt":
+        return {}
+    si = subprocess.STARTUPINFO()
+    si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {"startupinfo": si, "creationflags": subprocess.CREATE_NO_WINDOW}
+
+
+ADB_TIMEOUT = 10  # seconds before a one-shot adb command is given up
+TRACK_RETRY_DELAY = 2.0  # seconds before `adb track-devices` is run again after it ended
+RATE_WINDOW = 60.0  # seconds of scans behind the per-device scans/min
+ROUTES_FILE = "scanners.json"
+PRODUCTS_ROUTE = "products"
+
+
+def load_routes(path=ROUTES_FILE):
+    # {source id: "products" or a cart (terminal id)}, e.g.
+    #   {"R58M12ABCDE": "products", "emulator-5554": "counter-2"}
+    # A source id is an adb serial (`adb devices`) or a scan server device id.
+    # Sources not listed feed whichever tab is scanning, into this till's cart.
+    try:
+        with open(path, encoding="utf-8") as f:
+            routes = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+    if not isinstance(routes, dict) or not all(isinstance(v, str) and v for v in routes.values()):
+        raise ValueError(f'{path}: expected {{"<device>": "{PRODUCTS_ROUTE}" or "<cart name>", ...}}')
+    return routes
+
+
+def parse_devices(text):
+    # Serials of the phones adb can use, from `adb devices` lines; unauthorized
+    # or offline ones are left out until they are ready
+    serials = []
+    for line in text.splitlines():
+        serial, _, state = line.partition("\t")
+        if state.strip() == "device":
+            serials.append(serial.strip())
+    return serials
+
+
+class DeviceStats:
+    def __init__(self):
+        self.scans = 0
+        self.last_scan = None
+        self.last_lag = None
+        self.max_lag = None
+        self._recent = deque()  # (time, scans) within RATE_WINDOW
+
+    def add(self, now, scans, lags):
+        self.scans += scans
+        self.last_scan = now
+        self._recent.append((now, scans))
+        if lags:
+            self.last_lag = max(lags)
+            self.max_lag = max(self.last_lag, self.max_lag or 0.0)
+
+    def summary(self, now):
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+        return {
+            "scans": self.scans,
+            "per_minute": sum(scans for _, scans in self._recent) * 60 / RATE_WINDOW,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "idle": now - self.last_scan if self.last_scan is not None else None,
+        }
+
+
+# Follows barcode.txt on one phone (`adb -s SERIAL`) through one long-lived
+# `adb exec-out tail -F` stream. Every line appended since the last read is
+# passed on, in order, as one batch so fast scanning bursts are never dropped.
+class DeviceStream:
+    def __init__(self, serial, on_scans, stop_event, adb_path="adb", barcode_file=BARCODE_FILE):
+        self.serial = serial
+        self.on_scans = on_scans  # on_scans(serial, barcodes, lags)
+        self.adb_path = adb_path
+        self.barcode_file = barcode_file
+        self.offset = None  # bytes of barcode.txt already consumed
+        self.state = "starting"
+        self._stop = stop_event
+        self._process = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"adb-{self.serial}", daemon=True)
+        self._thread.start()
+
+    def kill(self):
+        process = self._process
+        if process:
+            process.kill()
+
+    def join(self, timeout=2):
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _adb(self, *args):
+        return [self.adb_path, '-s', self.serial, *args]
+
+    @metrics.timed("adb.stat")
+    def get_file_size(self):
+        try:
+            result = subprocess.check_output(
+                self._adb('shell', 'stat', '-c', '%s', self.barcode_file),
+                stderr=subprocess.DEVNULL, timeout=ADB_TIMEOUT, **adb_subprocess_kwargs()
+            )
+            return int(result.decode().strip())
+        except Exception:
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            size = self.get_file_size()
+            if size is None:
+                # Phone unplugged (or no file yet): wait for it to come back
+                self.state = "waiting"
+                self._stop.wait(RECONNECT_DELAY)
+                continue
+
+            if self.offset is None or size < self.offset:
+                # First connection, or the file was truncated on the phone
+                self.offset = size if self.offset is None else 0
+
+            self.state = "streaming"
+            self._follow()
+            self._stop.wait(RECONNECT_DELAY)
+        self.state = "stopped"
+
+    def _follow(self):
+        try:
+            with metrics.measure("adb.connect"):
+                process = subprocess.Popen(
+                    self._adb('exec-out', 'tail', '-c', f'+{self.offset + 1}', '-F', self.barcode_file),
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **adb_subprocess_kwargs()
+                )
+        except OSError:
+            return
+        self._process = process
+
+        pending = b''
+        try:
+            while not self._stop.is_set():
+                chunk = process.stdout.read1(4096)
+                if not chunk:
+                    break  # Device lost or stream killed
+                now = time.time()
+                pending += chunk
+                *lines, pending = pending.split(b'\n')
+                barcodes = []
+                lags = []  # seconds from the phone's scan time to now
+                for line in lines:
+                    self.offset += len(line) + 1
+                    text = line.decode(errors='replace')
+                    barcode = parse_barcode(text)
+                    if barcode:
+                        barcodes.append(barcode)
+                        scanned_at = parse_scan_time(text)
+                        if scanned_at:
+                            lags.append(max(0.0, now - scanned_at.timestamp()))
+                if barcodes:
+                    self.on_scans(self.serial, barcodes, lags)
+        finally:
+            self._process = None
+            process.kill()
+            process.wait()
+
+
+# Pool of every phone plugged in over adb: while a tab is scanning, one
+# long-lived `adb track-devices` stream reports phones as they are plugged in
+# and each phone gets a DeviceStream of its own, so several phones scan
+# concurrently. Scans from all of them (and from other transports, see
+# scan_server.py, through publish()) reach the tabs through one signal, tagged
+# with their source id: the adb serial or the scan server device id. Tabs look
+# the source up in routes (scanners.json) to pick their cart.
+class BarcodeScanner(QObject):
+    barcodes_scanned = pyqtSignal(str, list)  # source id, barcodes
+
+    def __init__(self, adb_path="adb", barcode_file=BARCODE_FILE, routes=None):
+        super().__init__()
+        self.adb_path = adb_path
+        self.barcode_file = barcode_file
+        self.routes = routes or {}
+        self._slots = []
+        self._streams = {}  # serial -> DeviceStream
+        self._serials = set()  # every phone seen over adb
+        self._stats = {}  # source id -> DeviceStats
+        self._lock = threading.Lock()
+        self._thread = None
+        self._tracker = None  # `adb track-devices` process
+        self._stop = threading.Event()
+
+    def subscribe(self, slot):
+        if slot in self._slots:
+            return
+        self._slots.append(slot)
+        self.barcodes_scanned.connect(slot)
+        self.start()
+
+    def unsubscribe(self, slot):
+        if slot not in self._slots:
+            return
+        self._slots.remove(slot)
+        self.barcodes_scanned.disconnect(slot)
+        if not self._slots:
+            self.stop()
+
+    def route(self, source):
+        # "products", a cart (terminal id), or None for this till's own cart
+        return self.routes.get(source)
+
+    def publish(self, source, barcodes, lags=()):
+        with self._lock:
+            stats = self._stats.get(source)
+            if stats is None:
+                stats = self._stats[source] = DeviceStats()
+            stats.add(time.time(), len(barcodes), lags)
+        self.barcodes_scanned.emit(source, barcodes)
+
+    def device_stats(self):
+        # One row per source seen since the last reset, plus connected phones
+        now = time.time()
+        with self._lock:
+            sources = sorted(set(self._stats) | set(self._streams))
+            rows = []
+            for source in sources:
+                stats = self._stats.get(source) or DeviceStats()
+                stream = self._streams.get(source)
+                rows.append({
+                    "source": source,
+                    "route": self.route(source),
+                    "state": stream.state if stream else ("stopped" if source in self._serials else "network"),
+                    **stats.summary(now),
+                })
+        return rows
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        # A fresh event per run: a stream of the previous run still stuck in
+        # an adb call sees its own event set and exits instead of resuming
+        # next to the new stream of the same phone
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._discover, args=(self._stop,), name="adb-devices", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Streams start again from the end of barcode.txt on the next start()
+        self._stop.set()
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+            tracker, self._tracker = self._tracker, None
+        if tracker:
+            tracker.kill()
+        for stream in streams:
+            stream.kill()
+        for stream in streams:
+            stream.join()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _discover(self, stop):
+        # `adb track-devices` prints the device list once, then again whenever
+        # a phone is plugged in, unplugged or authorized, each time as 4 hex
+        # digits of length followed by `adb devices` lines. It ends if adb is
+        # missing or its server restarts, and is then run again.
+        while not stop.is_set():
+            try:
+                process = subprocess.Popen(
+                    [self.adb_path, "track-devices"],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **adb_subprocess_kwargs()
+                )
+            except OSError:
+                stop.wait(TRACK_RETRY_DELAY)
+                continue
+            with self._lock:
+                if stop.is_set():
+                    process.kill()
+                self._tracker = process
+            try:
+                while True:
+                    header = process.stdout.read(4)
+                    if len(header) < 4:
+                        break  # adb ended, or stop() killed it
+                    payload = process.stdout.read(int(header, 16))
+                    self._add_streams(parse_devices(payload.decode(errors="replace")), stop)
+            except ValueError:
+                pass  # not a length header: start over
+            finally:
+                process.kill()
+                process.wait()
+            stop.wait(TRACK_RETRY_DELAY)
+
+    def _add_streams(self, serials, stop):
+        # Unplugged phones keep their stream, which waits for them to return
+        for serial in serials:
+            with self._lock:
+                if serial in self._streams or stop.is_set():
+                    continue
+                self._serials.add(serial)
+                stream = self._streams[serial] = DeviceStream(
+                    serial, self.publish, stop, self.adb_path, self.barcode_file
+                )
+            stream.start()
+
+_scanner = None
+
+
+def get_scanner():
+    global _scanner
+    if _scanner is None:
+        _scanner = BarcodeScanner()
+    return _scanner
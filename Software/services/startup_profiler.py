@@ -0,0 +1,75 @@
+import builtins
+import sys
+import time
+
+REPORT_FILE = "startup_profile.txt"
+TOP_IMPORTS = 30
+
+
+# Opt-in startup profiler (main.py --profile-startup). Times every module
+# imported after start(), split into self and cumulative time, plus named
+# init phases marked with mark(). Both calls are no-ops until started.
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.started_at = None
+        self.imports = []  # (module, cumulative seconds, self seconds)
+        self.phases = []   # (label, seconds since start)
+        self._stack = []
+        self._original_import = None
+
+    def start(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started_at = time.perf_counter()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self):
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        started = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.imports.append((name, elapsed, elapsed - children))
+
+    def mark(self, label):
+        if self.enabled:
+            self.phases.append((label, time.perf_counter() - self.started_at))
+
+    def report(self):
+        lines = ["Startup phases (ms since start):"]
+        previous = 0.0
+        for label, at in self.phases:
+            lines.append(f"  {at * 1000:9.1f}  (+{(at - previous) * 1000:7.1f})  {label}")
+            previous = at
+
+        lines.append("")
+        lines.append(f"Slowest imports (top {TOP_IMPORTS}, ms):")
+        lines.append(f"  {'cumulative':>10}  {'self':>8}  module")
+        for name, cumulative, own in sorted(self.imports, key=lambda i: i[1], reverse=True)[:TOP_IMPORTS]:
+            lines.append(f"  {cumulative * 1000:10.1f}  {own * 1000:8.1f}  {name}")
+        return "\n".join(lines)
+
+    def write_report(self, path=REPORT_FILE):
+        self.stop()
+        report = self.report()
+        print(report, file=sys.stderr)
+        with open(path, "w") as f:
+            f.write(report + "\n")
+
+
+profiler = StartupProfiler()
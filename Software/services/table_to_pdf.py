@@ -1,41 +1,101 @@
+import os
 from fpdf import FPDF
 from datetime import datetime
 
-def generate_table_pdf(title, headers, rows, filepath):
+from services.metrics import metrics
+
+HEADER_HEIGHT = 8
+ROW_HEIGHT = 6
+# FPDF keeps a whole document in memory until output(), so long exports are
+# split into files of at most this many rows (about 110 pages each)
+ROWS_PER_PART = 5000
+PROGRESS_EVERY = 500  # rows between progress() calls
+
+# Column widths for the known exports
+COLUMN_WIDTHS = {
+    "Facture History": [30, 45, 115],  # Total, Date, File
+    "Sales History": [35, 30, 25, 20, 80],  # Barcode, Name, Price, Qty, Date
+}
+
+
+class ExportCanceled(Exception):
+    pass
+
+
+def part_path(filepath, part):
+    # sales.pdf -> sales_part2.pdf
+    stem, ext = os.path.splitext(filepath)
+    return f"{stem}_part{part}{ext}"
+
+
+def _draw_headers(pdf, headers, col_widths):
+    pdf.set_font("Arial", "B", 10)
+    for width, header in zip(col_widths, headers):
+        pdf.cell(width, HEADER_HEIGHT, header, border=1)
+    pdf.ln()
+    pdf.set_font("Arial", "", 8)
+
+
+def _start_part(title, headers, col_widths, part, timestamp):
     pdf = FPDF()
+    pdf.set_auto_page_break(False)
     pdf.add_page()
 
     # Title
     pdf.set_font("Arial", "B", 16)
-    pdf.cell(200, 10, txt=title, ln=True, align='C')
+    pdf.cell(200, 10, txt=title if part == 1 else f"{title} (part {part})", ln=True, align='C')
 
     # Timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     pdf.set_font("Arial", "", 12)
     pdf.cell(200, 10, txt=f"Generated: {timestamp}", ln=True, align='C')
 
     pdf.ln(5)
+    _draw_headers(pdf, headers, col_widths)
+    return pdf
 
-    # Set column widths based on title
-    if title == "Facture History":
-        col_widths = [30, 45, 115]  # Total, Date, File
-    elif title == "Sales History":
-        col_widths = [35, 30, 25, 20, 80]  # Barcode, Name, Price, Qty, Date
-    else:
-        col_widths = [pdf.w / len(headers)] * len(headers)  # fallback
 
-    # Table headers
-    pdf.set_font("Arial", "B", 10)
-    for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], 8, header, border=1)
-    pdf.ln()
+@metrics.timed("pdf.table")
+def generate_table_pdf(title, headers, rows, filepath, col_widths=None, progress=None,
+                       rows_per_part=ROWS_PER_PART):
+    # rows may be any iterable (e.g. a database cursor generator) and are
+    # written one at a time, with the header row repeated on every page.
+    # Memory is bounded by rows_per_part: past that many rows the document is
+    # written out and a new one started, so a long export gives
+    # <name>_part1.pdf, <name>_part2.pdf, ... instead of filepath. progress(rows_written)
+    # is called every PROGRESS_EVERY rows; returning False cancels the export
+    # (ExportCanceled) and removes the files already written.
+    # -> list of the files written
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if col_widths is None:
+        col_widths = COLUMN_WIDTHS.get(title, [FPDF().w / len(headers)] * len(headers))  # fallback
 
-    # Table rows
-    pdf.set_font("Arial", "", 8)
-    for row in rows:
-        for i, item in enumerate(row):
-            text = str(item)
-            pdf.cell(col_widths[i], 6, text, border=1)
-        pdf.ln()
+    written = []
+    part = 1
+    pdf = _start_part(title, headers, col_widths, part, timestamp)
+    page_bottom = pdf.h - pdf.b_margin
+    count = 0
+    try:
+        for row in rows:
+            if count and count % rows_per_part == 0:
+                written.append(part_path(filepath, part))
+                pdf.output(written[-1])
+                part += 1
+                pdf = _start_part(title, headers, col_widths, part, timestamp)
+            elif pdf.get_y() + ROW_HEIGHT > page_bottom:
+                pdf.add_page()
+                _draw_headers(pdf, headers, col_widths)
+            for width, item in zip(col_widths, row):
+                pdf.cell(width, ROW_HEIGHT, str(item), border=1)
+            pdf.ln()
+            count += 1
+            if progress is not None and count % PROGRESS_EVERY == 0 and progress(count) is False:
+                raise ExportCanceled()
 
-    pdf.output(filepath)
+        last = filepath if part == 1 else part_path(filepath, part)
+        pdf.output(last)
+        written.append(last)
+    except BaseException:
+        for path in written:
+            os.remove(path)
+        raise
+    return written
@@ -0,0 +1,133 @@
+# Simulates scanning phones against the scan server, without a phone.
+#
+#   python -m services.scan_server                 (or the app with --scan-server)
+#   python tools/scan_simulator.py --devices 4 --scans 20000 --batch 50
+#
+# To load-test the database path as well, run the sink with --cart on a copy
+# of the shop database and scan that database's products:
+#
+#   python -m services.scan_server --cart test.sqlite
+#   python tools/scan_simulator.py --devices 4 --scans 2000 --from-db test.sqlite
+#
+# Each simulated device opens its own connection, identifies itself with HELLO
+# and sends scans in batches, waiting for the server's ACK after every batch.
+
+import argparse
+import asyncio
+import random
+import socket
+import sqlite3
+import time
+from datetime import datetime
+
+
+def scan_line(barcode):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"{barcode} | {timestamp}\n"
+
+
+def make_batches(barcodes, scans, batch_size, rng):
+    sent = 0
+    while sent < scans:
+        size = min(batch_size, scans - sent)
+        yield [rng.choice(barcodes) for _ in range(size)]
+        sent += size
+
+
+async def run_tcp_device(device_id, args, barcodes, latencies):
+    rng = random.Random(f"{args.seed}-{device_id}")
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    writer.write(f"HELLO {device_id}\n".encode())
+    sent = 0
+    for batch in make_batches(barcodes, args.scans, args.batch, rng):
+        started = time.perf_counter()
+        writer.write("".join(scan_line(b) for b in batch).encode())
+        await writer.drain()
+        sent += len(batch)
+        # The server acks the running total; wait until it covers this batch
+        while True:
+            ack = await reader.readline()
+            if not ack:
+                raise ConnectionError(f"{device_id}: server closed the connection")
+            if int(ack.split()[1]) >= sent:
+                break
+        latencies.append(time.perf_counter() - started)
+        if args.rate:
+            await asyncio.sleep(len(batch) / args.rate)
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+def run_udp_device(device_id, args, barcodes, latencies):
+    rng = random.Random(f"{args.seed}-{device_id}")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(2)
+    acked = 0
+    for batch in make_batches(barcodes, args.scans, args.batch, rng):
+        payload = f"HELLO {device_id}\n" + "".join(scan_line(b) for b in batch)
+        started = time.perf_counter()
+        sock.sendto(payload.encode(), (args.host, args.port))
+        try:
+            ack, _ = sock.recvfrom(64)
+            acked += int(ack.split()[1])
+            latencies.append(time.perf_counter() - started)
+        except socket.timeout:
+            pass
+        if args.rate:
+            time.sleep(len(batch) / args.rate)
+    sock.close()
+    return acked
+
+
+async def main_async(args):
+    if args.barcodes:
+        barcodes = args.barcodes.split(",")
+    elif args.from_db:
+        conn = sqlite3.connect(args.from_db)
+        barcodes = [row[0] for row in conn.execute("SELECT barcode FROM products ORDER BY id LIMIT ?", (args.catalog,))]
+        conn.close()
+    else:
+        barcodes = [f"{random.Random(args.seed + i).randrange(10**12, 10**13)}" for i in range(args.catalog)]
+    latencies = []
+    started = time.perf_counter()
+    if args.udp:
+        loop = asyncio.get_running_loop()
+        counts = await asyncio.gather(*(
+            loop.run_in_executor(None, run_udp_device, f"sim-{i}", args, barcodes, latencies)
+            for i in range(args.devices)
+        ))
+    else:
+        counts = await asyncio.gather(*(
+            run_tcp_device(f"sim-{i}", args, barcodes, latencies) for i in range(args.devices)
+        ))
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts)
+    latencies.sort()
+    print(f"{total} scans acknowledged from {args.devices} device(s) in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} scans/s)")
+    if latencies:
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        print(f"batch ack latency: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the scan server without a phone.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5577)
+    parser.add_argument("--udp", action="store_true", help="send datagrams instead of a TCP stream")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--scans", type=int, default=1000, help="scans per device")
+    parser.add_argument("--batch", type=int, default=1, help="scans per batch")
+    parser.add_argument("--rate", type=float, default=0, help="scans/s per device (0 = as fast as possible)")
+    parser.add_argument("--barcodes", help="comma-separated barcodes to scan (default: random)")
+    parser.add_argument("--from-db", metavar="DB_FILE", help="scan the barcodes of this database's products")
+    parser.add_argument("--catalog", type=int, default=100, help="barcodes to pick from")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+CART_HEADERS = ["ID", "Name", "Barcode", "Price", "Quantity"]
+
+
+# Cart rows (cart_id, name, barcode, price, quantity) kept in scan order.
+# Scans are applied as row-level inserts/updates and the total is kept
+# up to date incrementally, so a scan costs O(1) no matter the cart size.
+class CartTableModel(QAbstractTableModel):
+    total_changed = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._index = {}  # barcode -> row number
+        self.total = 0.0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(CART_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return CART_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self._rows[index.row()][index.column()]
+        if index.column() == 3:
+            return f"{value:.2f}"
+        return str(value)
+
+    def item(self, row):
+        return self._rows[row]
+
+    def reset(self, items):
+        self.beginResetModel()
+        self._rows = [tuple(item) for item in items]
+        self._index = {item[2]: row for row, item in enumerate(self._rows)}
+        self.endResetModel()
+        self._set_total(sum(price * quantity for _, _, _, price, quantity in self._rows))
+
+    def apply(self, items):
+        # Insert new cart lines and update existing ones in place
+        total = self.total
+        for item in items:
+            item = tuple(item)
+            barcode = item[2]
+            row = self._index.get(barcode)
+            if row is None:
+                row = len(self._rows)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.append(item)
+                self._index[barcode] = row
+                self.endInsertRows()
+            else:
+                old = self._rows[row]
+                total -= old[3] * old[4]
+                self._rows[row] = item
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(CART_HEADERS) - 1))
+            total += item[3] * item[4]
+        self._set_total(total)
+
+    def remove(self, barcode):
+        row = self._index.pop(barcode, None)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        _, _, _, price, quantity = self._rows.pop(row)
+        for later in self._rows[row:]:
+            self._index[later[2]] -= 1
+        self.endRemoveRows()
+        self._set_total(self.total - price * quantity)
+
+    def _set_total(self, total):
+        self.total = total if self._rows else 0.0
+        self.total_changed.emit(self.total)
@@ -0,0 +1,105 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QLabel, QPushButton
+)
+from PyQt6.QtCore import QTimer
+
+from services.database import get_catalog_cache_stats
+from services.metrics import metrics, METRICS_FILE
+from services.scanner import get_scanner, ROUTES_FILE
+
+METRIC_HEADERS = ["Operation", "Calls", "Mean (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)", "Total (ms)"]
+METRIC_FIELDS = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_ms"]
+DEVICE_HEADERS = ["Device", "Route", "State", "Scans", "Scans/min", "Lag (s)", "Max lag (s)", "Last scan"]
+REFRESH_MS = 1000
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+# Live view of the hot-path timings collected by services/metrics.py
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.setGeometry(150, 150, 800, 500)
+        layout = QVBoxLayout(self)
+
+        if metrics.enabled:
+            status = f"Timings since start (or last reset), also written to {METRICS_FILE}"
+        else:
+            status = "Timing is disabled. Start the app with --metrics (or BARCODE_METRICS=1) to collect it."
+        layout.addWidget(QLabel(status))
+
+        self.table = QTableWidget(0, len(METRIC_HEADERS))
+        self.table.setHorizontalHeaderLabels(METRIC_HEADERS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+
+        layout.addWidget(QLabel(f"Scanners (routes from {ROUTES_FILE}; lag is measured against the phone's clock)"))
+        self.device_table = QTableWidget(0, len(DEVICE_HEADERS))
+        self.device_table.setHorizontalHeaderLabels(DEVICE_HEADERS)
+        self.device_table.verticalHeader().setVisible(False)
+        self.device_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.device_table)
+
+        btn_layout = QHBoxLayout()
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        dump_btn = QPushButton("Write to File")
+        dump_btn.clicked.connect(metrics.dump)
+        dump_btn.setEnabled(metrics.enabled)
+        btn_layout.addWidget(reset_btn)
+        btn_layout.addWidget(dump_btn)
+        layout.addLayout(btn_layout)
+
+        # Refreshed only while the dialog is open
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (name, summary) in enumerate(snapshot.items()):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column, field in enumerate(METRIC_FIELDS, 1):
+                value = summary[field]
+                text = str(value) if field == "count" else f"{value:.3f}"
+                self.table.setItem(row, column, QTableWidgetItem(text))
+
+        cache = get_catalog_cache_stats()
+        self.cache_label.setText(
+            f"Catalog cache: {cache['size']} products, hit rate {cache['hit_rate']:.1%} "
+            f"({cache['hits']} hits, {cache['negative_hits']} known-missing, {cache['misses']} misses)"
+        )
+
+        devices = get_scanner().device_stats()
+        self.device_table.setRowCount(len(devices))
+        for row, device in enumerate(devices):
+            values = [
+                device["source"], device["route"] or "this till", device["state"], str(device["scans"]),
+                f"{device['per_minute']:.1f}", _seconds(device["last_lag"]), _seconds(device["max_lag"]),
+                "-" if device["idle"] is None else f"{device['idle']:.0f} s ago",
+            ]
+            for column, value in enumerate(values):
+                self.device_table.setItem(row, column, QTableWidgetItem(value))
+
+    def reset(self):
+        metrics.reset()
+        get_scanner().reset_stats()
+        self.refresh()
@@ -1,21 +1,61 @@
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem,
-    QLabel, QPushButton, QMessageBox, QFileDialog, QScrollArea
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView, QAbstractItemView,
+    QLabel, QPushButton, QMessageBox, QFileDialog, QLineEdit, QDateEdit
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QDate
 from services.database import (
-    get_sales_history,
-    get_facture_history,
+    iter_sales,
+    iter_factures,
+    get_sales_page,
+    get_factures_page,
+    get_facture_lines,
+    get_data_version,
     cancel_sale,
-    delete_facture_by_path
+    cancel_facture,
+    delete_facture,
+    SALE_COLUMNS,
+    FACTURE_COLUMNS
 )
-from services.table_to_pdf import generate_table_pdf
+from ui.paged_model import PagedTableModel, LoadErrorLabel
+from ui.reports_dialog import ReportsDialog
+from ui.table_export import export_table
+from services.facture_renderer import get_facture_renderer
+from datetime import datetime
+
+SALES_TABLE_COLUMNS = [
+    ("Barcode", "barcode"), ("Name", "name"), ("Price", "price"), ("Qty", "quantity"), ("Date", "date")
+]
+FACTURE_TABLE_COLUMNS = [("Total", "total"), ("Date", "date"), ("File", "filepath")]
+NO_DATE = QDate(2000, 1, 1)  # shown as "Any"
 
 
 class HistoryTab(QWidget):
     def __init__(self):
         super().__init__()
         layout = QVBoxLayout(self)
+        self.loaded_version = None
+
+        # Filters, evaluated by the database
+        filter_layout = QHBoxLayout()
+        self.barcode_filter = QLineEdit(placeholderText="Barcode")
+        self.date_from = self._date_filter()
+        self.date_to = self._date_filter()
+        apply_btn = QPushButton("Filter")
+        apply_btn.clicked.connect(self.apply_filters)
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(self.clear_filters)
+        filter_layout.addWidget(self.barcode_filter)
+        filter_layout.addWidget(QLabel("From"))
+        filter_layout.addWidget(self.date_from)
+        filter_layout.addWidget(QLabel("To"))
+        filter_layout.addWidget(self.date_to)
+        filter_layout.addWidget(apply_btn)
+        filter_layout.addWidget(clear_btn)
+        layout.addLayout(filter_layout)
+
+        self.reports_btn = QPushButton("Sales Reports")
+        self.reports_btn.clicked.connect(self.open_reports)
+        layout.addWidget(self.reports_btn)
 
         # Export buttons
         self.sales_export_btn = QPushButton("Export Sales to PDF")
@@ -24,11 +64,12 @@ class HistoryTab(QWidget):
 
         layout.addWidget(QLabel("Sales History"))
 
-        self.sales_table = QTableWidget()
-        self.sales_table.setColumnCount(5)
-        self.sales_table.setHorizontalHeaderLabels(["Barcode", "Name", "Price", "Qty", "Date"])
-        self.sales_table.verticalHeader().setVisible(False)
+        self.sales_model = PagedTableModel(
+            SALE_COLUMNS, SALES_TABLE_COLUMNS, get_sales_page, order_by="date", descending=True, parent=self
+        )
+        self.sales_table = self._history_view(self.sales_model)
         self.sales_table.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        layout.addWidget(LoadErrorLabel(self.sales_model, "sales"))
         layout.addWidget(self.sales_table)
 
         self.facture_export_btn = QPushButton("Export Factures to PDF")
@@ -37,11 +78,13 @@ class HistoryTab(QWidget):
 
         layout.addWidget(QLabel("Facture History"))
 
-        self.facture_table = QTableWidget()
-        self.facture_table.setColumnCount(3)
-        self.facture_table.setHorizontalHeaderLabels(["Total", "Date", "File"])
-        self.facture_table.verticalHeader().setVisible(False)
+        self.facture_model = PagedTableModel(
+            FACTURE_COLUMNS, FACTURE_TABLE_COLUMNS, get_factures_page, order_by="date", descending=True,
+            null_text="pending", parent=self  # no PDF yet: still rendering, or rendering failed
+        )
+        self.facture_table = self._history_view(self.facture_model)
         self.facture_table.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        layout.addWidget(LoadErrorLabel(self.facture_model, "factures"))
         layout.addWidget(self.facture_table)
 
         # Control buttons
@@ -49,29 +92,73 @@ class HistoryTab(QWidget):
         self.cancel_btn.clicked.connect(self.cancel_selected_sale)
         layout.addWidget(self.cancel_btn)
 
+        self.cancel_facture_btn = QPushButton("Cancel Selected Facture")
+        self.cancel_facture_btn.clicked.connect(self.cancel_selected_facture)
+        layout.addWidget(self.cancel_facture_btn)
+
+        self.render_facture_btn = QPushButton("Re-render Selected Facture PDF")
+        self.render_facture_btn.clicked.connect(self.render_selected_facture)
+        layout.addWidget(self.render_facture_btn)
+
         self.delete_facture_btn = QPushButton("Delete Selected Facture")
         self.delete_facture_btn.clicked.connect(self.delete_selected_facture)
         layout.addWidget(self.delete_facture_btn)
+        # data is loaded when the tab is first shown
+
+    def _date_filter(self):
+        date_edit = QDateEdit(calendarPopup=True)
+        date_edit.setDisplayFormat("yyyy-MM-dd")
+        date_edit.setMinimumDate(NO_DATE)
+        date_edit.setSpecialValueText("Any")
+        date_edit.setDate(NO_DATE)
+        return date_edit
 
-        self.load_history()
+    def _history_view(self, model):
+        view = QTableView()
+        view.setModel(model)
+        view.verticalHeader().setVisible(False)
+        view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        return view
+
+    def _filter_date(self, date_edit):
+        if date_edit.date() == NO_DATE:
+            return None
+        return date_edit.date().toString("yyyy-MM-dd")
+
+    def apply_filters(self):
+        date_from = self._filter_date(self.date_from)
+        date_to = self._filter_date(self.date_to)
+        self.sales_model.set_filters(
+            date_from=date_from, date_to=date_to, barcode=self.barcode_filter.text().strip()
+        )
+        self.facture_model.set_filters(date_from=date_from, date_to=date_to)
+
+    def clear_filters(self):
+        self.barcode_filter.clear()
+        self.date_from.setDate(NO_DATE)
+        self.date_to.setDate(NO_DATE)
+        self.apply_filters()
+
+    def open_reports(self):
+        ReportsDialog(self).exec()
 
     def load_history(self):
-        sales = get_sales_history()
-        self.sales_table.setRowCount(0)
-        for row_idx, sale in enumerate(sales):
-            self.sales_table.insertRow(row_idx)
-            for col_idx, value in enumerate(sale[1:]):
-                self.sales_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
-
-        factures = get_facture_history()
-        self.facture_table.setRowCount(0)
-        for row_idx, f in enumerate(factures):
-            self.facture_table.insertRow(row_idx)
-            for col_idx, value in enumerate(f[1:]):
-                self.facture_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
+        self.loaded_version = get_data_version("sales", "factures")
+        self.sales_model.reload()
+        self.facture_model.reload()
+
+    def refresh(self):
+        # Reload only if sales or factures changed since they were last loaded;
+        # a page that failed to load is asked for again
+        if get_data_version("sales", "factures") != self.loaded_version:
+            self.load_history()
+        else:
+            self.sales_model.retry()
+            self.facture_model.retry()
 
     def cancel_selected_sale(self):
-        selected_row = self.sales_table.currentRow()
+        selected_row = self.sales_table.currentIndex().row()
         if selected_row < 0:
             QMessageBox.warning(self, "No Selection", "Please select a sale to cancel.")
             return
@@ -83,21 +170,62 @@ class HistoryTab(QWidget):
         if reply != QMessageBox.StandardButton.Yes:
             return
 
-        barcode = self.sales_table.item(selected_row, 0).text()
-        name = self.sales_table.item(selected_row, 1).text()
-        price = float(self.sales_table.item(selected_row, 2).text())
-        quantity = int(self.sales_table.item(selected_row, 3).text())
-        date = self.sales_table.item(selected_row, 4).text()
+        sale_id, barcode, name, price, quantity, date = self.sales_model.row(selected_row)
 
         try:
-            cancel_sale(barcode, quantity, date)
+            cancel_sale(sale_id)
             QMessageBox.information(self, "Canceled", f"Sale for '{name}' was canceled.")
             self.load_history()
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
+    def cancel_selected_facture(self):
+        selected_row = self.facture_table.currentIndex().row()
+        if selected_row < 0:
+            QMessageBox.warning(self, "No Selection", "Please select a facture to cancel.")
+            return
+
+        reply = QMessageBox.question(
+            self, "Confirm", "Cancel every sale of this facture and put the products back in stock?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        facture_id, total, date, file_path = self.facture_model.row(selected_row)
+
+        try:
+            cancel_facture(facture_id)
+            QMessageBox.information(self, "Canceled", f"Facture of {date} was canceled.")
+            self.load_history()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+
+    def render_selected_facture(self):
+        # Writes the PDF again from the facture's sales lines, e.g. when the
+        # first rendering failed and the File column still says "pending"
+        selected_row = self.facture_table.currentIndex().row()
+        if selected_row < 0:
+            QMessageBox.warning(self, "No Selection", "Please select a facture to render.")
+            return
+
+        facture_id, total, date, file_path = self.facture_model.row(selected_row)
+        items = get_facture_lines(facture_id)
+        if not items:
+            QMessageBox.warning(self, "No Lines", "This facture has no sales lines to render.")
+            return
+
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Folder to Save Facture")
+        if not folder_path:
+            return
+
+        recorded = datetime.fromisoformat(date)
+        operation_id = f"{facture_id}_{recorded.strftime('%Y%m%d%H%M%S')}"
+        get_facture_renderer().submit(facture_id, operation_id, items, folder_path, recorded)
+        QMessageBox.information(self, "Rendering", f"The facture is being saved to:\n{folder_path}")
+
     def delete_selected_facture(self):
-        selected_row = self.facture_table.currentRow()
+        selected_row = self.facture_table.currentIndex().row()
         if selected_row < 0:
             QMessageBox.warning(self, "No Selection", "Please select a facture to delete.")
             return
@@ -109,10 +237,10 @@ class HistoryTab(QWidget):
         if reply != QMessageBox.StandardButton.Yes:
             return
 
-        file_path = self.facture_table.item(selected_row, 2).text()
+        facture_id, total, date, file_path = self.facture_model.row(selected_row)
 
         try:
-            delete_facture_by_path(file_path)
+            delete_facture(facture_id)
             QMessageBox.information(self, "Deleted", f"Facture deleted from database:\n{file_path}")
             self.load_history()
         except Exception as e:
@@ -121,19 +249,14 @@ class HistoryTab(QWidget):
     def export_sales_to_pdf(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Sales PDF", "", "PDF Files (*.pdf)")
         if path:
-            rows = []
-            for r in range(self.sales_table.rowCount()):
-                row = [self.sales_table.item(r, c).text() for c in range(self.sales_table.columnCount())]
-                rows.append(row)
-            generate_table_pdf("Sales History", ["Barcode", "Name", "Price", "Qty", "Date"], rows, path)
-            QMessageBox.information(self, "Saved", f"Sales exported to:\n{path}")
+            # Streams the rows matching the current filters straight from the database
+            filters = dict(self.sales_model.filters)
+            export_table(self, "Sales History", ["Barcode", "Name", "Price", "Qty", "Date"],
+                         lambda: iter_sales(**filters), path)
 
     def export_factures_to_pdf(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Factures PDF", "", "PDF Files (*.pdf)")
         if path:
-            rows = []
-            for r in range(self.facture_table.rowCount()):
-                row = [self.facture_table.item(r, c).text() for c in range(self.facture_table.columnCount())]
-                rows.append(row)
-            generate_table_pdf("Facture History", ["Total", "Date", "File"], rows, path)
-            QMessageBox.information(self, "Saved", f"Factures exported to:\n{path}")
+            filters = dict(self.facture_model.filters)
+            export_table(self, "Facture History", ["Total", "Date", "File"],
+                         lambda: iter_factures(**filters), path)
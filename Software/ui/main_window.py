@@ -1,8 +1,12 @@
-from PyQt6.QtWidgets import QMainWindow, QTabWidget
+from PyQt6.QtWidgets import QMainWindow, QTabWidget, QMessageBox
+from PyQt6.QtCore import QTimer
 from ui.products_tab import ProductsTab
 from ui.operation_tab import OperationTab
 from ui.history_tab import HistoryTab
-from PyQt6.QtGui import QIcon
+from ui.diagnostics_dialog import DiagnosticsDialog
+from services.facture_renderer import get_facture_renderer
+from services.startup_profiler import profiler
+from PyQt6.QtGui import QIcon, QAction
 import os
 
 class MainWindow(QMainWindow):
@@ -15,10 +19,14 @@ class MainWindow(QMainWindow):
 
         self.tabs = QTabWidget()
 
-        # Store instances so we can refresh them later
+        # Store instances so we can refresh them later. Tabs are built empty
+        # and load their data in the background when first shown.
         self.products_tab = ProductsTab()
+        profiler.mark("ProductsTab")
         self.operation_tab = OperationTab()
+        profiler.mark("OperationTab")
         self.history_tab = HistoryTab()
+        profiler.mark("HistoryTab")
 
         self.tabs.addTab(self.products_tab, "Products")
         self.tabs.addTab(self.operation_tab, "Buy / Operation")
@@ -26,14 +34,40 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.tabs)
 
+        diagnostics_action = QAction("Diagnostics", self)
+        diagnostics_action.setShortcut("F12")
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        self.menuBar().addMenu("Tools").addAction(diagnostics_action)
+        self.diagnostics_dialog = None
+
         # Connect tab switch to refresh
         self.tabs.currentChanged.connect(self.refresh_tab)
+        QTimer.singleShot(0, lambda: self.refresh_tab(self.tabs.currentIndex()))
+
+        # Factures are written in the background (see FactureRenderer)
+        renderer = get_facture_renderer()
+        renderer.rendered.connect(self.on_facture_rendered)
+        renderer.failed.connect(self.on_facture_failed)
 
     def refresh_tab(self, index):
         if index == 0:  # Products
-            self.products_tab.load_products()
+            self.products_tab.refresh()
         elif index == 1:  # Operation
-            if self.operation_tab.scan_window:
-                self.operation_tab.scan_window.update_table()
+            for window in self.operation_tab.scan_windows.values():
+                window.refresh()
         elif index == 2:  # History
-            self.history_tab.load_history()
+            self.history_tab.refresh()
+
+    def show_diagnostics(self):
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def on_facture_rendered(self, facture_id, filepath):
+        self.statusBar().showMessage(f"Facture saved successfully: {filepath}", 10000)
+        if self.tabs.currentIndex() == 2:
+            self.history_tab.refresh()
+
+    def on_facture_failed(self, facture_id, error):
+        QMessageBox.critical(self, "Facture Error", f"Failed to save facture #{facture_id}:\n{error}")
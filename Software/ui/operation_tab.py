@@ -1,11 +1,8 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QMessageBox
-from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton
 from ui.start_scan_window import ScanningWindow
-from services.database import (
-    get_product_by_barcode, clear_cart,
-    add_to_cart_or_increment
-)
-import subprocess
+from services.database import clear_cart, add_many_to_cart
+from services.scanner import get_scanner, PRODUCTS_ROUTE
+from services.metrics import metrics
 
 class OperationTab(QWidget):
     def __init__(self):
@@ -17,77 +14,52 @@ class OperationTab(QWidget):
         self.scan_btn.setObjectName("start_scan")
         self.layout.addWidget(self.scan_btn)
 
-        self.timer = QTimer()
-        self.timer.setInterval(1000)
-        self.timer.timeout.connect(self.check_new_barcode)
-
-        self.last_modified_time = None
-        self.last_barcode = None
-        self.scan_window = None
+        # Cart (None: this till's own, else a terminal id from the scanner
+        # routes) -> its scanning window
+        self.scan_windows = {}
 
     def start_scanning(self):
-        if not self.scan_window or not self.scan_window.isVisible():
-            self.scan_window = ScanningWindow()
-            self.scan_window.show()
-
+        window = self.cart_window(None)
         clear_cart()
-        self.scan_window.update_table()
-        self.last_modified_time = self.get_barcode_file_mtime()
-        self.last_barcode = None
-        self.timer.start()
-
-    def silent_subprocess(self, command_list):
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        return subprocess.check_output(command_list, startupinfo=startupinfo)
+        window.update_table()
+        get_scanner().subscribe(self.on_barcodes_scanned)
 
-    def get_barcode_file_mtime(self):
-        try:
-            result = self.silent_subprocess(
-                ['adb', 'shell', 'stat', '-c', '%Y', '/sdcard/barcode.txt']
-            )
-            return float(result.decode().strip())
-        except Exception:
-            return None
+    def cart_window(self, terminal_id):
+        # A phone routed to another cart opens a window of its own on its
+        # first scan; that cart starts empty like this till's one
+        window = self.scan_windows.get(terminal_id)
+        if window is None or not window.isVisible():
+            clear_cart(terminal_id)
+            window = ScanningWindow(terminal_id)
+            window.finished.connect(lambda: self.finish_operation(terminal_id))
+            window.show()
+            window.update_table()
+            self.scan_windows[terminal_id] = window
+        return window
 
-    def get_last_barcode(self):
-        try:
-            result = self.silent_subprocess(
-                ['adb', 'shell', 'tail', '-n', '1', '/sdcard/barcode.txt']
-            )
-            full_line = result.decode().strip()
-            barcode = full_line.split('|')[0].strip()
-            return barcode
-        except Exception:
-            return None
+    @metrics.timed("ui.on_barcodes_scanned")
+    def on_barcodes_scanned(self, source, barcodes):
+        terminal_id = get_scanner().route(source)
+        if terminal_id == PRODUCTS_ROUTE:
+            return
+        window = self.cart_window(terminal_id)
+        results = add_many_to_cart(barcodes, terminal_id)
+        window.apply_cart_changes(
+            [barcode for barcode, result in results.items() if result["accepted"]]
+        )
 
-    def check_new_barcode(self):
-        current_mtime = self.get_barcode_file_mtime()
-        if current_mtime and (self.last_modified_time is None or current_mtime > self.last_modified_time):
-            self.last_modified_time = current_mtime
-            barcode = self.get_last_barcode()
-            if barcode:
-                product = get_product_by_barcode(barcode)
-                if product is None:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Icon.Warning)
-                    msg.setText("This product does not exist in the database.")
-                    msg.setWindowTitle("Product Not Found")
-                    msg.exec()
-                    return
-                try:
-                    add_to_cart_or_increment(barcode)
-                except ValueError as e:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Icon.Warning)
-                    msg.setText(str(e))
-                    msg.setWindowTitle("Stock Error")
-                    msg.exec()
-                    return
-                if self.scan_window:
-                    self.scan_window.update_table()
+        rejected = [
+            f"{barcode}: {result['error']} ({result['rejected']} scan(s) rejected)"
+            for barcode, result in results.items() if result["rejected"]
+        ]
+        if rejected:
+            window.show_rejected(rejected)
 
-    def finish_operation(self):
-        if self.scan_window:
-            self.scan_window.close()
-        self.timer.stop()
+    def finish_operation(self, terminal_id):
+        # However the window was closed, its cart must not keep holding stock
+        clear_cart(terminal_id)
+        window = self.scan_windows.pop(terminal_id, None)
+        if window:
+            window.close()
+        if not self.scan_windows:
+            get_scanner().unsubscribe(self.on_barcodes_scanned)
@@ -0,0 +1,172 @@
+import html
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtWidgets import QLabel
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+PAGE_SIZE = 500
+
+# Pages are queried off the GUI thread; the worker has its own SQLite
+# connection (see database.get_connection)
+_page_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-loader")
+
+
+# Read-only table model over a database query, fetched page by page as the
+# view scrolls (canFetchMore/fetchMore) using keyset pagination on
+# (sort column, id). Sorting is done by the database, not in Python.
+# Nothing is loaded until the first reload(); each page is then fetched on a
+# background thread and appended when it arrives, so the GUI never blocks.
+# A page that fails to load emits load_failed and can be asked for again
+# (retry, or the view scrolling on).
+#
+#   fields      DB column names of each fetched row, must include "id"
+#   columns     (header, field) pairs for the visible columns
+#   fetch_page  fetch_page(after, limit, order_by, descending, **filters) -> rows,
+#               where after is the (order_by value, id) key of the last loaded row
+#   null_text   shown for NULL values
+class PagedTableModel(QAbstractTableModel):
+    page_loaded = pyqtSignal(int, list)  # generation, rows
+    page_failed = pyqtSignal(int, str)   # generation, error message
+    load_failed = pyqtSignal(str)        # error message, for the view's tab
+
+    def __init__(self, fields, columns, fetch_page, page_size=PAGE_SIZE,
+                 order_by="id", descending=False, null_text="", parent=None):
+        super().__init__(parent)
+        self.fields = list(fields)
+        self.columns = list(columns)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.order_by = order_by
+        self.descending = descending
+        self.null_text = null_text
+        self.filters = {}
+        self._id_pos = self.fields.index("id")
+        self._visible = [self.fields.index(field) for _, field in self.columns]
+        self._rows = []
+        self._exhausted = False
+        self._active = False
+        self._loading = False
+        self._generation = 0  # bumped on reload so late pages are dropped
+        self.error = None  # message of the last failed page, until one loads
+        self.page_loaded.connect(self._on_page_loaded)
+        self.page_failed.connect(self._on_page_failed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.columns[section][0]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self._rows[index.row()][self._visible[index.column()]]
+        return self.null_text if value is None else str(value)
+
+    def row(self, row):
+        return self._rows[row]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._active and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        generation = self._generation
+        args = (self._last_key(), self.page_size, self.order_by, self.descending)
+        filters = dict(self.filters)
+
+        def load():
+            try:
+                rows = self.fetch_page(*args, **filters)
+            except Exception as e:
+                self.page_failed.emit(generation, str(e))
+            else:
+                self.page_loaded.emit(generation, rows)
+
+        _page_loader.submit(load)
+
+    def _on_page_loaded(self, generation, rows):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self.error = None
+        self._append(rows)
+
+    def _on_page_failed(self, generation, message):
+        # Not exhausted: the same page is asked for again on the next fetch
+        if generation != self._generation:
+            return
+        self._loading = False
+        self.error = message
+        self.load_failed.emit(message)
+
+    def retry(self):
+        # Fetch the page that failed to load, if any
+        if self.error is not None:
+            self.fetchMore()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.order_by = self.columns[column][1]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        if self._active:
+            self.reload()
+
+    def set_filters(self, **filters):
+        self.filters = {key: value for key, value in filters.items() if value}
+        self.reload()
+
+    def reload(self):
+        self._active = True
+        self._generation += 1
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+        self.error = None
+        self.endResetModel()
+        self.fetchMore()
+
+    def _last_key(self):
+        if not self._rows:
+            return None
+        last = self._rows[-1]
+        return last[self.fields.index(self.order_by)], last[self._id_pos]
+
+    def _append(self, rows):
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+
+# Shows the page load errors of a model above its view, with a link to retry
+class LoadErrorLabel(QLabel):
+    def __init__(self, model, what, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.what = what
+        self.setObjectName("load_error")
+        self.setWordWrap(True)
+        self.hide()
+        model.load_failed.connect(self.show_error)
+        model.modelReset.connect(self.hide)
+        self.linkActivated.connect(self.retry)
+
+    def show_error(self, message):
+        self.setText(f"Could not load {self.what}: {html.escape(message)} <a href=\"retry\">Retry</a>")
+        self.show()
+
+    def retry(self):
+        self.hide()
+        self.model.retry()
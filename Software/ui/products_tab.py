@@ -1,45 +1,68 @@
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QHBoxLayout, QLineEdit, QMessageBox, QFileDialog
+    QWidget, QVBoxLayout, QTableView, QAbstractItemView,
+    QPushButton, QHBoxLayout, QLineEdit, QMessageBox, QFileDialog, QProgressDialog
 )
-from PyQt6.QtCore import QTimer
-import subprocess
-import os
+from PyQt6.QtCore import Qt, QTimer
 
 from services.database import (
-    get_products, add_product, delete_product_by_barcode,
-    update_product, get_product_by_barcode
+    iter_products, add_product, delete_product_by_barcode,
+    update_product, get_product_by_barcode,
+    get_products_page, get_data_version, PRODUCT_COLUMNS, SEARCH_COLUMNS
 )
-from services.table_to_pdf import generate_table_pdf
+from services import catalog_io
+from services.scanner import get_scanner, PRODUCTS_ROUTE
+from ui.paged_model import PagedTableModel, LoadErrorLabel
+from ui.table_export import export_table
+
+PRODUCT_TABLE_COLUMNS = [
+    ("ID", "id"), ("Name", "name"), ("Barcode", "barcode"), ("Price", "price"), ("Quantity", "quantity")
+]
+SEARCH_DELAY_MS = 250  # wait for a pause in typing before searching
 
 
 class ProductsTab(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
-        self.setup_ui()
-        self.load_products()
-
-        # Scanner timer setup
-        self.scan_timer = QTimer()
-        self.scan_timer.setInterval(1000)
-        self.scan_timer.timeout.connect(self.check_new_barcode)
-        self.last_modified_time = None
-        self.last_barcode = None
+        self.loaded_version = None
+        self.setup_ui()  # data is loaded when the tab is first shown
 
     def setup_ui(self):
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
+        self.search_input = QLineEdit(placeholderText="Search by name or barcode")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.layout.addWidget(self.search_input)
+
+        # Search results carry their rank after the product columns
+        self.model = PagedTableModel(SEARCH_COLUMNS, PRODUCT_TABLE_COLUMNS, get_products_page, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.verticalHeader().setVisible(False)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "Barcode", "Price", "Quantity"])
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.table.itemSelectionChanged.connect(self.load_selected_product)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.selectionModel().selectionChanged.connect(self.load_selected_product)
+        self.layout.addWidget(LoadErrorLabel(self.model, "products"))
         self.layout.addWidget(self.table)
 
         export_btn = QPushButton("Export Products to PDF")
         export_btn.clicked.connect(self.export_products_to_pdf)
         self.layout.addWidget(export_btn)
 
+        catalog_layout = QHBoxLayout()
+        import_catalog_btn = QPushButton("Import Catalog (CSV/JSONL)")
+        import_catalog_btn.clicked.connect(self.import_catalog)
+        export_catalog_btn = QPushButton("Export Catalog (CSV/JSONL)")
+        export_catalog_btn.clicked.connect(self.export_catalog)
+        catalog_layout.addWidget(import_catalog_btn)
+        catalog_layout.addWidget(export_catalog_btn)
+        self.layout.addLayout(catalog_layout)
+
         self.name_input = QLineEdit(placeholderText="Name")
         self.barcode_input = QLineEdit(placeholderText="Barcode")
         self.price_input = QLineEdit(placeholderText="Price")
@@ -71,19 +94,43 @@ class ProductsTab(QWidget):
         self.layout.addLayout(btn_layout)
 
     def load_products(self):
-        self.table.setRowCount(0)
-        for row, product in enumerate(get_products()):
-            self.table.insertRow(row)
-            for col, value in enumerate(product):
-                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+        self.loaded_version = get_data_version("products")
+        self.model.reload()
+
+    def refresh(self):
+        # Reload only if products changed since they were last loaded; a
+        # page that failed to load is asked for again
+        if get_data_version("products") != self.loaded_version:
+            self.load_products()
+        else:
+            self.model.retry()
+
+    def apply_search(self):
+        # Ranked results while searching, catalog order otherwise
+        search = self.search_input.text().strip()
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        if search:
+            self.model.order_by, self.model.descending = "rank", False
+            header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        else:
+            self.model.order_by, self.model.descending = "id", False
+            header.setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        header.blockSignals(False)
+        self.model.set_filters(search=search)
+
+    def selected_product(self):
+        selected = self.table.currentIndex().row()
+        return self.model.row(selected)[:len(PRODUCT_COLUMNS)] if selected >= 0 else None
 
     def load_selected_product(self):
-        selected = self.table.currentRow()
-        if selected >= 0:
-            self.name_input.setText(self.table.item(selected, 1).text())
-            self.barcode_input.setText(self.table.item(selected, 2).text())
-            self.price_input.setText(self.table.item(selected, 3).text())
-            self.quantity_input.setText(self.table.item(selected, 4).text())
+        product = self.selected_product()
+        if product:
+            _, name, barcode, price, quantity = product
+            self.name_input.setText(str(name))
+            self.barcode_input.setText(str(barcode))
+            self.price_input.setText(str(price))
+            self.quantity_input.setText(str(quantity))
 
     def add_product(self):
         try:
@@ -138,15 +185,15 @@ class ProductsTab(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to delete product: {str(e)}")
 
     def update_selected(self):
-        selected = self.table.currentRow()
-        if selected < 0:
+        product = self.selected_product()
+        if product is None:
             QMessageBox.warning(self, "Selection Required", "Please select a product to update")
             return
 
         try:
-            product_id = int(self.table.item(selected, 0).text())
+            product_id = product[0]
             new_barcode = self.barcode_input.text().strip()
-            original_barcode = self.table.item(selected, 2).text()
+            original_barcode = product[2]
 
             if not all([self.name_input.text(), new_barcode, self.price_input.text(), self.quantity_input.text()]):
                 raise ValueError("All fields are required")
@@ -176,17 +223,61 @@ class ProductsTab(QWidget):
         if not path:
             return
 
+        export_table(self, "Product List", ["ID", "Name", "Barcode", "Price", "Quantity"], iter_products, path)
+
+    def import_catalog(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Catalog", "", "Catalog Files (*.csv *.jsonl *.json);;All Files (*)"
+        )
+        if not path:
+            return
+
+        progress = QProgressDialog("Importing catalog...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(rows):
+            progress.setLabelText(f"Importing catalog... {rows} rows read")
+            progress.setValue(0)  # lets the dialog process events
+            return not progress.wasCanceled()
+
         try:
-            rows = []
-            for r in range(self.table.rowCount()):
-                row = [self.table.item(r, c).text() for c in range(self.table.columnCount())]
-                rows.append(row)
+            result = catalog_io.import_catalog(path, on_progress)
+        except Exception as e:
+            QMessageBox.critical(self, "Import Error", f"Failed to import catalog:\n{str(e)}")
+            return
+        finally:
+            progress.close()
+
+        if result["canceled"]:
+            QMessageBox.information(self, "Import Canceled", "The import was canceled, no product was changed.")
+            return
 
-            generate_table_pdf("Product List", ["ID", "Name", "Barcode", "Price", "Quantity"], rows, path)
-            QMessageBox.information(self, "Saved", f"Products exported to:\n{path}")
+        self.load_products()
+        message = (f"{result['inserted']} products added, {result['updated']} updated, "
+                   f"{result['unchanged']} already up to date.")
+        rejected = result["rejected"]
+        if rejected:
+            rejects_path = path + ".rejects.csv"
+            catalog_io.write_rejects(rejected, rejects_path)
+            details = "\n".join(f"Line {line}: {reason}" for line, reason in rejected[:10])
+            message += f"\n{len(rejected)} rows rejected (saved to {rejects_path}):\n{details}"
+            QMessageBox.warning(self, "Import Finished", message)
+        else:
+            QMessageBox.information(self, "Import Finished", message)
+
+    def export_catalog(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Catalog", "", "CSV Files (*.csv);;JSON Lines (*.jsonl)"
+        )
+        if not path:
+            return
 
+        try:
+            count = catalog_io.export_catalog(path)
+            QMessageBox.information(self, "Saved", f"{count} products exported to:\n{path}")
         except Exception as e:
-            QMessageBox.critical(self, "Export Error", f"Failed to export products:\n{str(e)}")
+            QMessageBox.critical(self, "Export Error", f"Failed to export catalog:\n{str(e)}")
 
     def clear_inputs(self):
         self.name_input.clear()
@@ -195,38 +286,11 @@ class ProductsTab(QWidget):
         self.quantity_input.clear()
 
     def start_barcode_scan(self):
-        self.last_modified_time = self.get_barcode_file_mtime()
-        self.last_barcode = None
-        self.scan_timer.start()
-
-    def run_adb_command(self, command):
-        # Hidden cmd window on Windows
-        si = subprocess.STARTUPINFO()
-        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        return subprocess.check_output(command, startupinfo=si, creationflags=subprocess.CREATE_NO_WINDOW)
-
-    def get_barcode_file_mtime(self):
-        try:
-            result = self.run_adb_command(['adb', 'shell', 'stat', '-c', '%Y', '/sdcard/barcode.txt'])
-            return float(result.decode().strip())
-        except Exception:
-            return None
+        get_scanner().subscribe(self.on_barcodes_scanned)
 
-    def get_last_barcode(self):
-        try:
-            result = self.run_adb_command(['adb', 'shell', 'tail', '-n', '1', '/sdcard/barcode.txt'])
-            full_line = result.decode().strip()
-            barcode = full_line.split('|')[0].strip()
-            return barcode
-        except Exception:
-            return None
-
-    def check_new_barcode(self):
-        current_mtime = self.get_barcode_file_mtime()
-        if current_mtime and (self.last_modified_time is None or current_mtime > self.last_modified_time):
-            self.last_modified_time = current_mtime
-            barcode = self.get_last_barcode()
-            if barcode and barcode != self.last_barcode:
-                self.last_barcode = barcode
-                self.barcode_input.setText(barcode)
-                self.scan_timer.stop()
+    def on_barcodes_scanned(self, source, barcodes):
+        # Phones routed to a cart are left to the Buy / Operation tab
+        if get_scanner().route(source) not in (None, PRODUCTS_ROUTE):
+            return
+        self.barcode_input.setText(barcodes[-1])
+        get_scanner().unsubscribe(self.on_barcodes_scanned)
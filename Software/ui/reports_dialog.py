@@ -0,0 +1,96 @@
+from datetime import date
+
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QLabel, QPushButton, QDateEdit, QMessageBox
+)
+from PyQt6.QtCore import QDate
+
+from services.reports import get_daily_report, get_product_report, get_summary
+
+
+# End-of-day / month-to-date figures, read from the summary tables so they
+# open instantly whatever the size of the sales history.
+class ReportsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Sales Reports")
+        self.setGeometry(150, 150, 700, 500)
+        layout = QVBoxLayout(self)
+
+        range_layout = QHBoxLayout()
+        today_btn = QPushButton("Today")
+        today_btn.clicked.connect(self.show_today)
+        month_btn = QPushButton("Month to Date")
+        month_btn.clicked.connect(self.show_month_to_date)
+        self.date_from = self._date_edit()
+        self.date_to = self._date_edit()
+        show_btn = QPushButton("Show")
+        show_btn.clicked.connect(self.load_report)
+        range_layout.addWidget(today_btn)
+        range_layout.addWidget(month_btn)
+        range_layout.addWidget(QLabel("From"))
+        range_layout.addWidget(self.date_from)
+        range_layout.addWidget(QLabel("To"))
+        range_layout.addWidget(self.date_to)
+        range_layout.addWidget(show_btn)
+        layout.addLayout(range_layout)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        layout.addWidget(QLabel("Per Day"))
+        self.daily_table = self._table(["Day", "Items", "Revenue"])
+        layout.addWidget(self.daily_table)
+
+        layout.addWidget(QLabel("Best Sellers"))
+        self.product_table = self._table(["Barcode", "Name", "Items", "Revenue"])
+        layout.addWidget(self.product_table)
+
+        self.show_today()
+
+    def _date_edit(self):
+        date_edit = QDateEdit(calendarPopup=True)
+        date_edit.setDisplayFormat("yyyy-MM-dd")
+        date_edit.setDate(QDate.currentDate())
+        return date_edit
+
+    def _table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        return table
+
+    def _fill(self, table, rows):
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                table.setItem(i, j, QTableWidgetItem(text))
+
+    def show_today(self):
+        self.date_from.setDate(QDate.currentDate())
+        self.date_to.setDate(QDate.currentDate())
+        self.load_report()
+
+    def show_month_to_date(self):
+        today = date.today()
+        self.date_from.setDate(QDate(today.year, today.month, 1))
+        self.date_to.setDate(QDate.currentDate())
+        self.load_report()
+
+    def load_report(self):
+        date_from = self.date_from.date().toString("yyyy-MM-dd")
+        date_to = self.date_to.date().toString("yyyy-MM-dd")
+        try:
+            summary = get_summary(date_from, date_to)
+            self._fill(self.daily_table, get_daily_report(date_from, date_to))
+            self._fill(self.product_table, get_product_report(date_from, date_to))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.summary_label.setText(
+            f"Revenue: {summary['revenue']:.2f} TND   Items: {summary['items']}   "
+            f"Factures: {summary['factures']}   Average basket: {summary['average_basket']:.2f}"
+        )
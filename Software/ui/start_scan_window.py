@@ -1,30 +1,53 @@
-from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QTableWidget, 
-                            QTableWidgetItem, QPushButton, QLabel, 
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QTableView, 
+                            QAbstractItemView, QPushButton, QLabel, 
                             QInputDialog, QMessageBox, QFileDialog)
+from PyQt6.QtCore import QTimer
 
-from services.database import get_cart_items, get_product_by_barcode, get_connection, clear_cart, record_sale, record_facture, add_to_cart_or_increment, decrement_stock_after_sale
-from services.pdf_generator import generate_facture_pdf
+from services.database import get_cart_items, get_cart_items_by_barcodes, get_product_by_barcode, clear_cart, checkout, add_to_cart_or_increment, remove_from_cart, set_cart_quantity, get_data_version
+from services.facture_renderer import get_facture_renderer
+from services.metrics import metrics
+from ui.cart_model import CartTableModel
 from datetime import datetime
 
+REJECTED_NOTICE_MS = 10000  # how long rejected scans stay listed
+
 
 class ScanningWindow(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, terminal_id=None, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Scanning Products")
+        # Cart shown here: this till's own (None) or one a phone is routed to
+        self.terminal_id = terminal_id
+        self.setWindowTitle("Scanning Products" if terminal_id is None else f"Scanning Products – {terminal_id}")
         self.setGeometry(100, 100, 600, 400)
         self.layout = QVBoxLayout(self)
         
+        self.loaded_version = None
+
         # Create table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "Barcode", "Price"])
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.cart_model = CartTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.cart_model)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.table.verticalHeader().setVisible(False)
         self.layout.addWidget(self.table)
         
         # Total label
         self.total_label = QLabel("Total: 0.0")
+        self.cart_model.total_changed.connect(lambda total: self.total_label.setText(f"Total: {total:.2f}"))
         self.layout.addWidget(self.total_label)
+
+        # Scans rejected lately (unknown barcode, out of stock); shown here
+        # rather than in a dialog so scanning is never interrupted
+        self.rejected_label = QLabel()
+        self.rejected_label.setObjectName("rejected_label")
+        self.rejected_label.setWordWrap(True)
+        self.rejected_label.hide()
+        self.rejected_timer = QTimer(self)
+        self.rejected_timer.setSingleShot(True)
+        self.rejected_timer.setInterval(REJECTED_NOTICE_MS)
+        self.rejected_timer.timeout.connect(self.rejected_label.hide)
+        self.layout.addWidget(self.rejected_label)
         
         # Buttons
         self.finish_btn = QPushButton("Finish Scanning")
@@ -49,85 +72,66 @@ class ScanningWindow(QDialog):
         self.cancel_btn.clicked.connect(self.cancel_scan)
         self.cancel_btn.setProperty("class", "secondary")
         self.layout.addWidget(self.cancel_btn)
-        
-        self.cart = []
-
-    def add_product(self, product):
-        for i, item in enumerate(self.cart):
-            if item[2] == product[2]:
-                new_quantity = item[4] + 1
-                self.cart[i] = (item[0], item[1], item[2], item[3], new_quantity)
-                self.update_table()
-                return
-        product_with_quantity = (*product, 1)
-        self.cart.append(product_with_quantity)
-        self.update_table()
-
 
+    @metrics.timed("ui.update_table")
     def update_table(self):
-        self.cart = []
-        for row in get_cart_items():
-            cart_id, name, barcode, price, quantity = row
-            self.cart.append((cart_id, name, barcode, price, quantity))
+        # Full reload, only needed when the cart may have changed elsewhere
+        self.cart_model.reset(get_cart_items(self.terminal_id))
+        self.loaded_version = get_data_version("cart")
 
-        self.table.setRowCount(len(self.cart))
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "Barcode", "Price", "Quantity"])
+    def refresh(self):
+        if get_data_version("cart") != self.loaded_version:
+            self.update_table()
 
-        for row, product in enumerate(self.cart):
-            self.table.setItem(row, 0, QTableWidgetItem(str(product[0])))
-            self.table.setItem(row, 1, QTableWidgetItem(product[1]))
-            self.table.setItem(row, 2, QTableWidgetItem(product[2]))
-            self.table.setItem(row, 3, QTableWidgetItem(f"{product[3]:.2f}"))
-            self.table.setItem(row, 4, QTableWidgetItem(str(product[4])))
+    @metrics.timed("ui.apply_cart_changes")
+    def apply_cart_changes(self, barcodes):
+        # Refresh just the cart lines touched by a scan or edit
+        self.cart_model.apply(get_cart_items_by_barcodes(barcodes, self.terminal_id))
+        self.loaded_version = get_data_version("cart")
 
-        total = sum(p[3] * p[4] for p in self.cart)
-        self.total_label.setText(f"Total: {total:.2f}")
+    def show_rejected(self, lines):
+        self.rejected_label.setText("Scan rejected:\n" + "\n".join(lines))
+        self.rejected_label.show()
+        self.rejected_timer.start()
 
     def delete_selected_item(self):
-        selected = self.table.currentRow()
+        selected = self.table.currentIndex().row()
         if selected < 0:
             return
 
-        barcode = self.cart[selected][2]
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM cart WHERE barcode = ?", (barcode,))
-        conn.commit()
-        conn.close()
-        self.update_table()
+        barcode = self.cart_model.item(selected)[2]
+        remove_from_cart(barcode, self.terminal_id)
+        self.cart_model.remove(barcode)
+        self.loaded_version = get_data_version("cart")
 
     def update_quantity(self):
-        selected = self.table.currentRow()
+        selected = self.table.currentIndex().row()
         if selected < 0:
             return
 
-        barcode = self.cart[selected][2]
+        barcode = self.cart_model.item(selected)[2]
         product = get_product_by_barcode(barcode)
         if not product:
             return
 
-        available_stock = product[4]
         qty, ok = QInputDialog.getInt(self, "Update Quantity", "Enter new quantity:", min=1)
 
         if ok:
-            if qty > available_stock:
+            # Checked against the live stock, less what other tills hold
+            try:
+                set_cart_quantity(barcode, qty, self.terminal_id)
+            except ValueError as e:
                 msg = QMessageBox()
                 msg.setIcon(QMessageBox.Icon.Warning)
-                msg.setText(f"Only {available_stock} items available in stock.")
+                msg.setText(str(e))
                 msg.setWindowTitle("Stock Error")
                 msg.exec()
                 return
 
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("UPDATE cart SET quantity_to_buy = ? WHERE barcode = ?", (qty, barcode))
-            conn.commit()
-            conn.close()
-            self.update_table()
+            self.apply_cart_changes([barcode])
 
     def cancel_scan(self):
-        clear_cart()
+        clear_cart(self.terminal_id)
         self.update_table()
         self.reject()
 
@@ -143,28 +147,25 @@ class ScanningWindow(QDialog):
         if not folder_path:
             return
 
-        items = get_cart_items()
+        items = get_cart_items(self.terminal_id)
         if not items:
             QMessageBox.information(self, "Empty Cart", "No products to save.")
             return
 
         formatted_items = [(name, barcode, price, quantity) for _, name, barcode, price, quantity in items]
-        operation_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        filepath = generate_facture_pdf(operation_id, formatted_items, folder_path)
-
-        # Record sales
-        for _, name, barcode, price, quantity in items:
-            record_sale(barcode, name, price, quantity)
-            
-        # Decrement stock
-        decrement_stock_after_sale(items)
-
-        # Record facture
-        total_price = sum(price * quantity for _, name, barcode, price, quantity in items)
-        record_facture(total_price, filepath)
-
-        QMessageBox.information(self, "Saved", f"Facture saved successfully:\n{filepath}")
-        clear_cart()
+        # Record sales, decrement stock, record facture and clear the cart at once;
+        # the PDF is written in the background and its path recorded when done
+        try:
+            facture_id = checkout(items, None, self.terminal_id)
+        except ValueError as e:
+            QMessageBox.warning(self, "Stock Error", str(e))
+            return
+        # The facture id keeps file names unique when several carts (routed
+        # phones) check out within the same second
+        operation_id = f"{facture_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        get_facture_renderer().submit(facture_id, operation_id, formatted_items, folder_path)
+
+        QMessageBox.information(self, "Saved", f"Sale recorded. The facture is being saved to:\n{folder_path}")
         self.accept()
 
     def add_product_manually(self):
@@ -175,15 +176,10 @@ class ScanningWindow(QDialog):
                 QMessageBox.warning(self, "Not Found", "Product not found in database.")
                 return
 
-            available_qty = product[4]
-            if available_qty <= 0:
-                QMessageBox.warning(self, "Out of Stock", "This product is out of stock.")
-                return
-
             try:
-                add_to_cart_or_increment(barcode.strip())
+                add_to_cart_or_increment(barcode.strip(), self.terminal_id)
             except ValueError as e:
                 QMessageBox.warning(self, "Stock Error", str(e))
                 return
 
-            self.update_table()
+            self.apply_cart_changes([barcode.strip()])
@@ -0,0 +1,84 @@
+import threading
+
+from PyQt6.QtWidgets import QMessageBox, QProgressDialog
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from services.database import close_connection
+
+
+# Writes a table PDF on a worker thread, so a long export (a million sales
+# rows) neither freezes the window nor loads the rows in the GUI. The rows
+# are read on that thread too, through its own database connection.
+class TableExport(QObject):
+    progress = pyqtSignal(int)   # rows written
+    finished = pyqtSignal(list)  # files written
+    failed = pyqtSignal(str)     # error message
+    canceled = pyqtSignal()
+
+    def __init__(self, title, headers, make_rows, path, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.headers = headers
+        self.make_rows = make_rows  # called on the worker thread -> row iterable
+        self.path = path
+        self._cancel = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="table-pdf", daemon=True).start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _on_progress(self, rows):
+        self.progress.emit(rows)
+        return not self._cancel.is_set()
+
+    def _run(self):
+        try:
+            from services.table_to_pdf import generate_table_pdf, ExportCanceled  # FPDF is loaded on first export
+        except ImportError as e:
+            self.failed.emit(str(e))
+            return
+        try:
+            files = generate_table_pdf(self.title, self.headers, self.make_rows(), self.path,
+                                       progress=self._on_progress)
+        except ExportCanceled:
+            self.canceled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(files)
+        finally:
+            close_connection()
+
+
+def export_table(parent, title, headers, make_rows, path):
+    # Runs the export behind a progress dialog and reports the files written
+    export = TableExport(title, headers, make_rows, path, parent)
+    progress = QProgressDialog(f"Exporting {title}...", "Cancel", 0, 0, parent)
+    progress.setMinimumDuration(0)
+    progress.canceled.connect(export.cancel)
+
+    def done():
+        progress.close()
+        export.deleteLater()
+
+    def on_finished(files):
+        done()
+        if len(files) == 1:
+            QMessageBox.information(parent, "Saved", f"{title} exported to:\n{files[0]}")
+        else:
+            QMessageBox.information(parent, "Saved", f"{title} exported to {len(files)} files:\n"
+                                    f"{files[0]}\n...\n{files[-1]}")
+
+    def on_failed(error):
+        done()
+        QMessageBox.critical(parent, "Export Error", f"Failed to export {title}:\n{error}")
+
+    export.progress.connect(lambda rows: progress.setLabelText(f"Exporting {title}... {rows} rows written"))
+    export.finished.connect(on_finished)
+    export.failed.connect(on_failed)
+    export.canceled.connect(done)
+    export.start()
+    progress.show()
+    return export